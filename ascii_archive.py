@@ -0,0 +1,237 @@
+"""
+Python file for reading and writing ASCII video archives.
+
+An archive keeps the grid of gscale indices of every frame instead of rendered images, so a video
+only has to be converted once and can then be rendered in any style later without decoding it again.
+
+Layout of the file (little endian):
+    header      magic, version, fps, grid size, source size, frame count, index offset, gscale
+    frames      every frame as raw indices, run length encoded, or run length encoded XOR of the previous frame
+    index       (offset, length, encoding) of every frame, so any frame can be found straight away
+"""
+
+import mmap
+import numpy as np
+import os
+import struct
+
+
+ARCHIVE_MAGIC = b"A2AV"
+ARCHIVE_VERSION = 1
+
+# magic, version, fps, columns, rows, source width, source height, frame count, index offset, gscale length
+HEADER_FORMAT = "<4sHdIIIIIQI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"), ("encoding", "u1")])
+
+ENCODING_RAW = 0
+ENCODING_RLE = 1
+ENCODING_DELTA_RLE = 2
+
+MAX_RUN_LENGTH = 0xFFFF
+
+
+def encode_runs(values):
+    """
+    Run length encodes a flat uint8 array, returns the bytes of
+    (number of runs as uint32, value of every run as uint8, length of every run as uint16).
+    """
+    if len(values) == 0:
+        return struct.pack("<I", 0)
+
+    # Where every run starts and how long it is
+    run_starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    run_lengths = np.diff(np.append(run_starts, len(values)))
+
+    # Split runs that are too long for uint16
+    pieces = (run_lengths + MAX_RUN_LENGTH - 1) // MAX_RUN_LENGTH
+    run_values = np.repeat(values[run_starts], pieces)
+    piece_lengths = np.full(len(run_values), MAX_RUN_LENGTH, dtype=np.int64)
+    piece_lengths[np.cumsum(pieces) - 1] = run_lengths - (pieces - 1) * MAX_RUN_LENGTH
+
+    return struct.pack("<I", len(run_values)) + run_values.astype(np.uint8).tobytes() + piece_lengths.astype("<u2").tobytes()
+
+
+def decode_runs(data):
+    """
+    Decodes bytes made by `encode_runs` back into a flat uint8 array.
+    """
+    run_count = struct.unpack_from("<I", data)[0]
+    run_values = np.frombuffer(data, dtype=np.uint8, count=run_count, offset=4)
+    run_lengths = np.frombuffer(data, dtype="<u2", count=run_count, offset=4 + run_count)
+    return np.repeat(run_values, run_lengths)
+
+
+class ASCIIArchiveWriter:
+    """
+    Writes frames of gscale indices to an ASCII video archive, one `append` per frame.
+    """
+
+    def __init__(self, archive_path: str, fps: float, columns: int, rows: int, gscale: str,
+                 source_width: int=0, source_height: int=0, delta: bool=False, keyframe_interval: int=30) -> None:
+        """
+        @param delta: Also try encoding frames against the frame before them, which is a lot smaller
+        for video, at the cost of reading up to `keyframe_interval` frames to get one.
+        """
+        self.archive_path = archive_path
+        self.fps = fps
+        self.columns = columns
+        self.rows = rows
+        self.gscale = gscale
+        self.source_width = source_width
+        self.source_height = source_height
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+
+        self.index = []
+        self.previous_frame = None
+        self.frames_since_keyframe = 0
+
+        # Header gets written again with the frame count and index offset when closing
+        self.file = open(archive_path, mode="wb")
+        self._write_header(0, 0)
+
+    def _write_header(self, frame_count: int, index_offset: int):
+        """
+        Writes the header at the start of the file, shouldn't be called outside class.
+        """
+        gscale_bytes = self.gscale.encode("utf-8")
+        self.file.seek(0)
+        self.file.write(struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, ARCHIVE_VERSION, self.fps, self.columns, self.rows,
+                                    self.source_width, self.source_height, frame_count, index_offset, len(gscale_bytes)))
+        self.file.write(gscale_bytes)
+
+    def append(self, indices):
+        """
+        Adds a frame, `indices` being a (rows, columns) grid of gscale indices.
+        """
+        if indices.shape != (self.rows, self.columns):
+            raise ValueError(f"Frame of shape {indices.shape} given to archive of shape {(self.rows, self.columns)}")
+
+        frame = np.ascontiguousarray(indices, dtype=np.uint8).ravel()
+
+        # Keep whichever encoding is smallest
+        candidates = [(ENCODING_RAW, frame.tobytes()), (ENCODING_RLE, encode_runs(frame))]
+
+        if self.delta and self.previous_frame is not None and self.frames_since_keyframe < self.keyframe_interval:
+            candidates.append((ENCODING_DELTA_RLE, encode_runs(frame ^ self.previous_frame)))
+
+        encoding, data = min(candidates, key=lambda candidate: len(candidate[1]))
+
+        self.frames_since_keyframe = self.frames_since_keyframe + 1 if encoding == ENCODING_DELTA_RLE else 0
+        self.previous_frame = frame
+
+        self.index.append((self.file.tell(), len(data), encoding))
+        self.file.write(data)
+
+    def close(self):
+        """
+        Writes the index and finishes the header.
+        """
+        if self.file.closed:
+            return
+
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+        self._write_header(len(self.index), index_offset)
+        self.file.close()
+
+
+class ASCIIArchiveReader:
+    """
+    Reads frames out of an ASCII video archive, memory mapped so any frame can be read
+    without going through the ones before it.
+    """
+
+    def __init__(self, archive_path: str) -> None:
+        self.archive_path = archive_path
+
+        with open(archive_path, mode="rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.fps, self.columns, self.rows, self.source_width, self.source_height,
+         self.frame_count, index_offset, gscale_length) = struct.unpack_from(HEADER_FORMAT, self.mmap)
+
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            self.mmap.close()
+            raise ValueError(f"'{archive_path}' is not an ASCII video archive this version can read")
+
+        self.gscale = self.mmap[HEADER_SIZE:HEADER_SIZE + gscale_length].decode("utf-8")
+        self.index = np.frombuffer(self.mmap, dtype=INDEX_DTYPE, count=self.frame_count, offset=index_offset)
+
+        # Last frame read, so reading frames in order doesn't go back to the keyframe every time
+        self.cached_frame_number = -1
+        self.cached_frame = None
+
+    def __len__(self):
+        return self.frame_count
+
+    def _read_frame_data(self, frame_number: int):
+        """
+        Returns the encoding and the encoded bytes of a frame, shouldn't be called outside class.
+        """
+        offset, length, encoding = self.index[frame_number]
+        return encoding, self.mmap[int(offset):int(offset) + int(length)]
+
+    def get_frame(self, frame_number: int):
+        """
+        Returns frame `frame_number` as a (rows, columns) grid of gscale indices.
+        """
+        if not 0 <= frame_number < self.frame_count:
+            raise IndexError(f"Frame {frame_number} out of range for archive of {self.frame_count} frames")
+
+        if frame_number == self.cached_frame_number:
+            return self.cached_frame.reshape(self.rows, self.columns)
+
+        # Go back to the last frame that doesn't depend on the one before it, or to just after the last frame read
+        start = frame_number
+
+        while self.index[start]["encoding"] == ENCODING_DELTA_RLE and start - 1 != self.cached_frame_number:
+            start -= 1
+
+        frame = self.cached_frame
+
+        for i in range(start, frame_number + 1):
+            encoding, data = self._read_frame_data(i)
+
+            if encoding == ENCODING_RAW:
+                frame = np.frombuffer(data, dtype=np.uint8)
+            elif encoding == ENCODING_RLE:
+                frame = decode_runs(data)
+            else:
+                frame = frame ^ decode_runs(data)
+
+        self.cached_frame_number = frame_number
+        self.cached_frame = frame
+
+        return frame.reshape(self.rows, self.columns)
+
+    def get_text(self, frame_number: int):
+        """
+        Returns frame `frame_number` as ASCII characters, in the same form as `IMG2ASCIIConverter.create_text`.
+        """
+        frame = self.get_frame(frame_number)
+
+        # Same as `IMG2ASCIIConverter.create_text`, a newline after every row and none at the end
+        char_codes = np.frombuffer(self.gscale.encode("utf-32-le"), dtype="<u4")
+        text_array = np.empty((self.rows, self.columns + 1), dtype="<u4")
+        text_array[:, :self.columns] = char_codes[frame]
+        text_array[:, self.columns] = ord("\n")
+
+        return text_array.tobytes().decode("utf-32-le")[:-1]
+
+    def close(self):
+        """
+        Unmaps the archive.
+        """
+        self.index = None
+        self.cached_frame = None
+        self.mmap.close()
+
+
+def default_archive_path(video_path: str):
+    """
+    Returns the archive path for a video, the video path with _ascii.a2v instead of the extension.
+    """
+    return os.path.splitext(video_path)[0] + "_ascii.a2v"
@@ -0,0 +1,292 @@
+"""
+Python file for benchmarking the hot loops of the converters.
+"""
+
+from argparse import ArgumentParser
+import cv2
+import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from img2ascii import IMG2ASCIIConverter
+from helper import bcolors
+
+
+def _time_call(function, repeat: int=5):
+    """
+    Returns the best time out of `repeat` calls of `function`, in seconds.
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - t0)
+
+    return best
+
+
+def benchmark_create_text(columns_list=(100, 200, 400), gscale_level: int=0, repeat: int=5):
+    """
+    Compares the lookup table version of `create_text` against the per pixel loop version.
+
+    Returns a list of (columns, loop time, lookup table time) tuples.
+    """
+    rng = np.random.default_rng(0)
+    converter = IMG2ASCIIConverter()
+    gscale = converter.gscale[gscale_level % len(converter.gscale)]
+    results = []
+
+    for columns in columns_list:
+        # Roughly the shape `scale_image` gives for a 16:9 frame
+        rows = columns * 9 * 2 // (16 * 5)
+        converter.set_image_by_array(rng.integers(0, 256, size=(rows, columns), dtype=np.uint8))
+
+        loop_text = converter._create_text_by_loop(gscale)
+        table_text = converter.create_text(gscale_level=gscale_level)
+
+        if loop_text != table_text:
+            print(f"{bcolors.FAIL}[-] Output of lookup table differs from loop at {columns} columns >:( {bcolors.ENDC}\n")
+
+        loop_time = _time_call(lambda: converter._create_text_by_loop(gscale), repeat)
+        table_time = _time_call(lambda: converter.create_text(gscale_level=gscale_level), repeat)
+
+        results.append((columns, loop_time, table_time))
+
+        print(f"{bcolors.OKCYAN}create_text {columns:>4} x {rows:<4} loop {loop_time * 1000:8.3f}ms  lookup table {table_time * 1000:8.3f}ms  ({loop_time / table_time:.1f}x){bcolors.ENDC}")
+
+    return results
+
+
+def benchmark_create_image(columns_list=(100, 200, 400), backends=("cairo", "atlas"), repeat: int=5):
+    """
+    Times `create_image` for every render backend on the same random text.
+
+    Returns a list of (columns, backend, time) tuples.
+    """
+    rng = np.random.default_rng(0)
+    results = []
+
+    for columns in columns_list:
+        rows = columns * 9 * 2 // (16 * 5)
+        image_array = rng.integers(0, 256, size=(rows, columns), dtype=np.uint8)
+
+        for backend in backends:
+            converter = IMG2ASCIIConverter()
+            converter.set_render_backend(backend)
+            converter.set_ascii_chars_count(columns, columns)
+            converter.set_image_by_array(image_array)
+            converter.create_text()
+
+            backend_time = _time_call(converter.create_image, repeat)
+            results.append((columns, backend, backend_time))
+
+            print(f"{bcolors.OKCYAN}create_image {columns:>4} x {rows:<4} {backend:<6} {backend_time * 1000:8.3f}ms{bcolors.ENDC}")
+
+    return results
+
+
+def benchmark_colour(columns_list=(100, 200, 400), backend: str="atlas", resolution=(1280, 720), repeat: int=5):
+    """
+    Times a whole frame (scale, text, image) in grayscale against the same frame in colour,
+    and how long the ANSI text of the coloured frame takes in both palettes.
+
+    Returns a list of (columns, grayscale time, colour time, truecolor text time, 256 colour text time) tuples.
+    """
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(resolution[1], resolution[0], 3), dtype=np.uint8)
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    results = []
+
+    for columns in columns_list:
+        times = []
+
+        for colour in (False, True):
+            converter = IMG2ASCIIConverter()
+            converter.set_render_backend(backend)
+            converter.set_colour(colour)
+            converter.set_ascii_chars_count(columns, columns)
+
+            def convert():
+                converter.set_image_by_array(frame if colour else gray_frame)
+                converter.scale_image()
+                converter.create_text()
+                converter.create_image()
+
+            times.append(_time_call(convert, repeat))
+
+        # Build the 256 colour table before timing
+        converter.create_ansi_text("256")
+        truecolor_time = _time_call(lambda: converter.create_ansi_text("truecolor"), repeat)
+        palette_time = _time_call(lambda: converter.create_ansi_text("256"), repeat)
+        results.append((columns, *times, truecolor_time, palette_time))
+
+        print(f"{bcolors.OKCYAN}colour {columns:>4} columns grayscale frame {times[0] * 1000:8.3f}ms  colour frame {times[1] * 1000:8.3f}ms  "
+              f"truecolor text {truecolor_time * 1000:8.3f}ms  256 colour text {palette_time * 1000:8.3f}ms{bcolors.ENDC}")
+
+    return results
+
+
+def benchmark_shape_matching(columns_list=(100, 200, 400), resolution=(1280, 720), repeat: int=5):
+    """
+    Times text by brightness at some number of columns against text by shape at half as many,
+    which is about where the two look equally sharp.
+
+    Returns a list of (columns, brightness time, shape matching time at columns // 2) tuples.
+    """
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(resolution[1], resolution[0]), dtype=np.uint8)
+    results = []
+
+    for columns in columns_list:
+        times = []
+
+        for shape_matching, shape_columns in ((False, columns), (True, columns // 2)):
+            converter = IMG2ASCIIConverter()
+            converter.set_shape_matching(shape_matching)
+            converter.set_ascii_chars_count(shape_columns, shape_columns)
+
+            def convert():
+                converter.set_image_by_array(frame)
+                converter.scale_image()
+                converter.create_text()
+
+            times.append(_time_call(convert, repeat))
+
+        results.append((columns, *times))
+
+        print(f"{bcolors.OKCYAN}shape {columns:>4} columns by brightness {times[0] * 1000:8.3f}ms  "
+              f"{columns // 2:>4} columns by shape {times[1] * 1000:8.3f}ms{bcolors.ENDC}")
+
+    return results
+
+
+def benchmark_scale_image(resolutions=((1280, 720), (1920, 1080), (3840, 2160)), columns: int=200, repeat: int=5):
+    """
+    Compares `scale_image` (one resize into a reused buffer) against the old way of
+    stretching by the font ratio first and then resizing again.
+
+    Returns a list of ((width, height), two resizes time, one resize time) tuples.
+    """
+    rng = np.random.default_rng(0)
+    converter = IMG2ASCIIConverter()
+    converter.set_ascii_chars_count(columns, columns)
+    results = []
+
+    for width, height in resolutions:
+        frame = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+
+        def scale_twice():
+            converter.set_image_by_array(frame)
+            converter.scale_image_by_ratio(5 / 2, 1)
+            scale_ratio = min((converter.horizontal_ascii_chars_count / converter.image_width),
+                              (converter.vertical_ascii_chars_count / converter.image_height))
+            converter.scale_image_by_ratio(scale_ratio, scale_ratio)
+
+        def scale_once():
+            converter.set_image_by_array(frame)
+            converter.scale_image()
+
+        twice_time = _time_call(scale_twice, repeat)
+        once_time = _time_call(scale_once, repeat)
+        results.append(((width, height), twice_time, once_time))
+
+        print(f"{bcolors.OKCYAN}scale_image {width:>4} x {height:<4} two resizes {twice_time * 1000:8.3f}ms  one resize {once_time * 1000:8.3f}ms  ({twice_time / once_time:.1f}x){bcolors.ENDC}")
+
+    return results
+
+
+def benchmark_video_workers(video_path: str, max_workers: int=os.cpu_count(), columns: int=200, backend: str="atlas"):
+    """
+    Converts the same video with 1 to `max_workers` worker processes, and prints the frames per second of each
+    and the speed up over 1 worker.
+
+    Returns a list of (workers, frames per second) tuples.
+    """
+    from vid2ascii import VID2ASCIIConverter
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for workers in range(1, max_workers + 1):
+            converter = VID2ASCIIConverter()
+            converter.set_video(video_path)
+            converter.init_image_to_ascii_converter(columns, columns)
+            converter.set_render_backend(backend)
+            converter.video_output_path = os.path.join(temp_dir, "out.mp4")
+
+            t0 = time.perf_counter()
+            converter.create_video(compression_speed="ultrafast", add_original_audio=False, workers=workers)
+            frames_per_second = converter.total_frame_count / (time.perf_counter() - t0)
+
+            results.append((workers, frames_per_second))
+
+        for workers, frames_per_second in results:
+            print(f"{bcolors.OKCYAN}create_video {workers:>2} workers {frames_per_second:8.2f} fps  ({frames_per_second / results[0][1]:.2f}x){bcolors.ENDC}")
+
+    return results
+
+
+def benchmark_startup(repeat: int=3):
+    """
+    Times how long the CLI takes from start to finish on a tiny image and video for text only, image
+    and video runs, and how long importing what each of those needs takes on its own, in fresh
+    Python processes every time so nothing is already imported.
+
+    Returns a list of (mode, import time, run time) tuples.
+    """
+    cli_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "img2ascii_cli.py")
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(cli_path), os.environ.get("PYTHONPATH")])))
+    rng = np.random.default_rng(0)
+    results = []
+
+    def run(command, cwd):
+        subprocess.run(command, cwd=cwd, env=environment, stdout=subprocess.DEVNULL, check=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_path = os.path.join(temp_dir, "startup.png")
+        video_path = os.path.join(temp_dir, "startup.mp4")
+        cv2.imwrite(image_path, rng.integers(0, 256, size=(72, 128), dtype=np.uint8))
+
+        video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (128, 72))
+        for _ in range(5):
+            video_writer.write(rng.integers(0, 256, size=(72, 128, 3), dtype=np.uint8))
+        video_writer.release()
+
+        python_time = _time_call(lambda: run([sys.executable, "-c", "pass"], temp_dir), repeat)
+        print(f"{bcolors.OKCYAN}startup python alone {python_time * 1000:8.1f}ms{bcolors.ENDC}")
+
+        modes = [
+            ("text only", "import img2ascii", ["-i", image_path, "--text-only"]),
+            ("image", "import img2ascii, cairo", ["-i", image_path]),
+            ("video", "import vid2ascii, imageio_ffmpeg", ["-v", video_path, "-cs", "9"]),
+        ]
+
+        for mode, imports, arguments in modes:
+            import_time = _time_call(lambda: run([sys.executable, "-c", imports], temp_dir), repeat)
+            run_time = _time_call(lambda: run([sys.executable, cli_path, *arguments], temp_dir), repeat)
+            results.append((mode, import_time, run_time))
+
+            print(f"{bcolors.OKCYAN}startup {mode:<9} imports {import_time * 1000:8.1f}ms  whole run {run_time * 1000:8.1f}ms{bcolors.ENDC}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("-v", "--video", help="Path to video file, to also measure how create_video scales with workers")
+    parser.add_argument("-w", "--workers", default=os.cpu_count(), type=int, help="Maximum number of workers to measure")
+    args = parser.parse_args()
+
+    benchmark_scale_image()
+    benchmark_create_text()
+    benchmark_create_image()
+    benchmark_colour()
+    benchmark_shape_matching()
+    benchmark_startup()
+
+    if args.video:
+        benchmark_video_workers(args.video, args.workers)
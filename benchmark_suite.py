@@ -0,0 +1,312 @@
+"""
+Python file for a benchmark suite of the converters, run on inputs made up on the spot (gradients, noise, moving shapes)
+so it needs nothing downloaded, and compared against the results of an earlier run to catch things getting slower.
+"""
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import cv2
+import json
+import numpy as np
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from img2ascii import IMG2ASCIIConverter
+from helper import bcolors
+from profiler import StageProfiler
+
+
+IMAGE_KINDS = ("gradient", "noise", "shapes")
+VIDEO_KINDS = ("gradient", "noise", "shapes")
+
+# Output modes, as (render backend or None for text only, colour)
+IMAGE_MODES = {
+    "text": (None, False),
+    "cairo": ("cairo", False),
+    "atlas": ("atlas", False),
+    "colour": ("atlas", True),
+}
+
+# Video modes, as (render backend, threads, workers)
+VIDEO_MODES = {
+    "serial": ("atlas", 0, 0),
+    "serial_cairo": ("cairo", 0, 0),
+    "threads": ("atlas", 2, 0),
+    "workers": ("atlas", 0, 2),
+}
+
+FULL_SETTINGS = {
+    "image_resolutions": ((640, 360), (1280, 720), (1920, 1080)),
+    "columns": (100, 200, 400),
+    "gscale_levels": (0, 1),
+    "video_resolutions": ((640, 360), (1280, 720)),
+    "video_lengths": (30, 120),
+    "video_columns": (100, 200),
+    "repeat": 5,
+}
+
+QUICK_SETTINGS = {
+    "image_resolutions": ((1280, 720),),
+    "columns": (100, 200),
+    "gscale_levels": (0, 1),
+    "video_resolutions": ((640, 360),),
+    "video_lengths": (30,),
+    "video_columns": (100,),
+    "repeat": 3,
+}
+
+
+def make_image(kind: str, width: int, height: int, frame_number: int=0, seed: int=0):
+    """
+    Returns a BGR test image, the same every time for the same arguments.
+
+    "gradient" is smooth colour ramps, "noise" is random pixels (the worst case for every cache),
+    "shapes" is a few flat shapes on a plain background, which move with `frame_number`.
+    """
+    if kind == "gradient":
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        shift = frame_number * 4
+        image = np.stack([(x + shift) / width, y / height, 1 - (x + y + shift) / (width + height)], axis=-1)
+        return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+    if kind == "noise":
+        rng = np.random.default_rng(seed + frame_number)
+        return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+    if kind == "shapes":
+        image = np.full((height, width, 3), 30, dtype=np.uint8)
+        size = min(width, height)
+        offset = frame_number * size // 60
+
+        cv2.circle(image, ((width // 4 + offset) % width, height // 2), size // 5, (40, 200, 240), -1)
+        cv2.rectangle(image, (width // 2, (height // 5 + offset) % height), (width // 2 + size // 3, (height // 5 + offset) % height + size // 4), (220, 120, 40), -1)
+        cv2.line(image, (0, height - 1 - offset % height), (width - 1, offset % height), (255, 255, 255), max(1, size // 50))
+        return image
+
+    raise ValueError(f"Unknown test image kind '{kind}'")
+
+
+def make_video(video_path: str, kind: str, width: int, height: int, frame_count: int, fps: int=30):
+    """
+    Writes a test video of `frame_count` frames of `make_image(kind, ...)`, returns the path.
+    """
+    video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+    for frame_number in range(frame_count):
+        video_writer.write(make_image(kind, width, height, frame_number))
+
+    video_writer.release()
+    return video_path
+
+
+def _stage_bests(profiler):
+    """
+    Returns {stage: best seconds} of a profiler, the best time being a lot steadier from run to run than the median.
+    """
+    return {name: min(seconds for seconds, _ in samples) for name, samples in profiler.samples.items()}
+
+
+def run_image_case(image, columns: int, gscale_level: int, mode: str, repeat: int):
+    """
+    Converts `image` `repeat` times (after one run that also sets everything up) in one output mode,
+    and returns the time of the first run, the best and median time of the others, and the best time of every stage.
+    """
+    backend, colour = IMAGE_MODES[mode]
+    converter = IMG2ASCIIConverter()
+    converter.set_ascii_chars_count(columns, columns)
+    converter.set_render_backend(backend or "cairo")
+    converter.set_colour(colour)
+
+    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def convert():
+        converter.set_image_by_array(image if colour else gray_image)
+        converter.scale_image()
+        converter.create_text(gscale_level=gscale_level)
+
+        if backend is not None:
+            converter.create_image()
+
+    t0 = time.perf_counter()
+    convert()
+    first_time = time.perf_counter() - t0
+
+    profiler = StageProfiler()
+    converter.set_profiler(profiler)
+    times = []
+
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        convert()
+        times.append(time.perf_counter() - t0)
+
+    return {"first_seconds": first_time, "seconds": min(times), "median_seconds": float(np.median(times)), "stages": _stage_bests(profiler)}
+
+
+def run_video_case(video_path: str, output_path: str, columns: int, mode: str):
+    """
+    Converts a test video in one mode, and returns the time taken, the fps and the best time of every stage.
+    """
+    from vid2ascii import VID2ASCIIConverter
+
+    backend, threads, workers = VIDEO_MODES[mode]
+    profiler = StageProfiler()
+
+    converter = VID2ASCIIConverter()
+    converter.set_video(video_path)
+    converter.init_image_to_ascii_converter(columns, columns)
+    converter.set_render_backend(backend)
+    converter.set_profiler(profiler)
+    converter.video_output_path = output_path
+
+    t0 = time.perf_counter()
+    converter.create_video(compression_speed="ultrafast", add_original_audio=False, threads=threads, workers=workers)
+    seconds = time.perf_counter() - t0
+
+    return {"seconds": seconds, "fps": converter.total_frame_count / seconds, "stages": _stage_bests(profiler)}
+
+
+def run_suite(settings: dict, include_video: bool=True, log=print):
+    """
+    Runs every image case, and every video case if `include_video`, with the resolutions, character counts,
+    gscale levels and lengths in `settings` (see `FULL_SETTINGS`).
+
+    Returns {case name: result}, every result having at least "seconds" and "stages".
+    """
+    results = {}
+    devnull = open(os.devnull, mode='w')
+
+    try:
+        for kind in IMAGE_KINDS:
+            for width, height in settings["image_resolutions"]:
+                image = make_image(kind, width, height)
+
+                for columns in settings["columns"]:
+                    for gscale_level in settings["gscale_levels"]:
+                        for mode in IMAGE_MODES:
+                            name = f"image/{kind}/{width}x{height}/c{columns}/g{gscale_level}/{mode}"
+
+                            with redirect_stdout(devnull):
+                                results[name] = run_image_case(image, columns, gscale_level, mode, settings["repeat"])
+
+                            log(f"{bcolors.OKCYAN}{name:<48} {results[name]['seconds'] * 1000:10.3f}ms{bcolors.ENDC}")
+
+        if not include_video:
+            return results
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for kind in VIDEO_KINDS:
+                for width, height in settings["video_resolutions"]:
+                    for frame_count in settings["video_lengths"]:
+                        video_path = make_video(os.path.join(temp_dir, f"{kind}_{width}x{height}_{frame_count}.mp4"), kind, width, height, frame_count)
+
+                        for columns in settings["video_columns"]:
+                            for mode in VIDEO_MODES:
+                                name = f"video/{kind}/{width}x{height}/f{frame_count}/c{columns}/{mode}"
+
+                                with redirect_stdout(devnull):
+                                    results[name] = run_video_case(video_path, os.path.join(temp_dir, "out.mp4"), columns, mode)
+
+                                log(f"{bcolors.OKCYAN}{name:<48} {results[name]['seconds']:10.3f}s  {results[name]['fps']:8.2f} fps{bcolors.ENDC}")
+    finally:
+        devnull.close()
+
+    return results
+
+
+def environment_info():
+    """
+    Returns what the results depend on besides the code, so results from different machines aren't mixed up.
+    """
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_results(results: dict, baseline: dict, threshold: float=0.2, min_difference: float=0.0005):
+    """
+    Compares the total and per stage times of every case that is in both `results` and `baseline`.
+
+    Returns a list of (case name, stage or "total", baseline seconds, seconds) for everything that got more than
+    `threshold` (a fraction) slower, ignoring differences under `min_difference` seconds which are just noise.
+    """
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        pairs = [("total", baseline[name]["seconds"], result["seconds"])]
+        pairs += [(stage, baseline[name]["stages"][stage], seconds) for stage, seconds in result["stages"].items() if stage in baseline[name]["stages"]]
+
+        for stage, baseline_seconds, seconds in pairs:
+            if seconds > baseline_seconds * (1 + threshold) and seconds - baseline_seconds > min_difference:
+                regressions.append((name, stage, baseline_seconds, seconds))
+
+    return regressions
+
+
+def load_results(results_path: str):
+    """
+    Returns the environment info and results saved by `save_results`.
+    """
+    with open(results_path) as f:
+        saved = json.load(f)
+
+    return saved["environment"], saved["results"]
+
+
+def save_results(results_path: str, results: dict):
+    """
+    Saves results with the environment they were measured in, as JSON.
+    """
+    with open(results_path, mode='w') as f:
+        json.dump({"environment": environment_info(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("-q", "--quick", action="store_true", help="Run a smaller set of cases")
+    parser.add_argument("-nv", "--no-video", action="store_true", help="Only run the image cases")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Where to write the results as JSON")
+    parser.add_argument("-b", "--baseline", help="Results of an earlier run to compare against")
+    parser.add_argument("-sb", "--save-baseline", action="store_true", help="Also write the results to the --baseline path, to compare later runs against")
+    parser.add_argument("-th", "--threshold", default=0.2, type=float, help="How much slower (as a fraction) a case or stage can get before it counts as a regression")
+    args = parser.parse_args()
+
+    results = run_suite(QUICK_SETTINGS if args.quick else FULL_SETTINGS, include_video=not args.no_video)
+    save_results(args.output, results)
+    print(f"\n{bcolors.WARNING}[+] Results of {len(results)} case(s) written to {args.output} ·w· {bcolors.ENDC}\n")
+
+    if args.baseline and args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"{bcolors.WARNING}[+] Saved as the baseline at {args.baseline} ·w· {bcolors.ENDC}\n")
+
+    elif args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"{bcolors.WARNING}[-] Baseline of path '{args.baseline}' does not exist, run with --save-baseline first 0.o {bcolors.ENDC}\n")
+            sys.exit(1)
+
+        baseline_environment, baseline = load_results(args.baseline)
+
+        if baseline_environment != environment_info():
+            print(f"{bcolors.WARNING}[!] Baseline was measured somewhere else, comparing anyway but take it with a grain of salt :/ {bcolors.ENDC}\n")
+
+        regressions = compare_results(results, baseline, args.threshold)
+
+        for name, stage, baseline_seconds, seconds in regressions:
+            print(f"{bcolors.FAIL}[-] {name} {stage} {baseline_seconds * 1000:.3f}ms -> {seconds * 1000:.3f}ms ({seconds / baseline_seconds:.2f}x){bcolors.ENDC}")
+
+        if regressions:
+            print(f"\n{bcolors.FAIL}[-] {len(regressions)} regression(s) over {args.threshold:.0%} >:( {bcolors.ENDC}\n")
+            sys.exit(1)
+
+        print(f"{bcolors.OKGREEN}[+] No regressions over {args.threshold:.0%} against {args.baseline} ^o^ {bcolors.ENDC}\n")
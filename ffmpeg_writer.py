@@ -0,0 +1,170 @@
+"""
+Python file for a video writer that streams raw frames straight into ffmpeg.
+"""
+
+import numpy as np
+import os
+import subprocess
+import tempfile
+
+
+# Containers whose audio can always be copied into an MP4 as it is, audio of anything else is encoded to AAC
+MP4_AUDIO_EXTENSIONS = (".mp4", ".m4v", ".m4a")
+
+
+def audio_codec_arguments(audio_source_path: str):
+    """
+    Returns the ffmpeg arguments for the audio of an MP4 output with the audio of `audio_source_path`, copied as it is
+    if the source is an MP4 too, or encoded to AAC otherwise, as other containers can have audio MP4 can't hold (Vorbis, PCM...).
+    """
+    if os.path.splitext(audio_source_path)[1].lower() in MP4_AUDIO_EXTENSIONS:
+        return ["-c:a", "copy"]
+
+    return ["-c:a", "aac", "-b:a", "192k"]
+
+
+def trimmed_input(input_path: str, start_time: float=0, duration: float=-1):
+    """
+    Returns the ffmpeg arguments for reading `input_path` from `start_time` seconds for `duration` seconds
+    (-1 is until the end), seeking in the input so nothing before the start is read.
+    """
+    arguments = ["-ss", f"{start_time:.6f}"] if start_time > 0 else []
+
+    if duration > 0:
+        arguments += ["-t", f"{duration:.6f}"]
+
+    return arguments + ["-i", input_path]
+
+
+class FFmpegPipeWriter:
+    """
+    A video writer that pipes raw frames to a single ffmpeg process, which encodes them
+    and can also copy the audio of another file into the output in the same go.
+
+    Video is encoded to H.264, so the output should be .mp4 (or a container like .mkv or .mov that can hold it).
+    Outputs ending with .gif are written with ffmpeg's GIF encoder instead, which only stores the part of
+    every frame that changed. Gray frames keep a gray palette, colour frames get a palette made for every frame.
+
+    Has the same `append_data` / `close` / `closed` as imageio writers.
+    """
+
+    # Raw pixel format of frames going into ffmpeg, by number of channels
+    PIXEL_FORMATS = {1: "gray", 3: "bgr24", 4: "bgra"}
+
+    def __init__(self, output_path: str, fps: float, preset: str="slower", audio_source_path: str=None,
+                 audio_start_time: float=0, audio_duration: float=-1) -> None:
+        self.output_path = output_path
+        self.fps = fps
+        self.preset = preset
+        self.audio_source_path = audio_source_path
+        self.audio_start_time = audio_start_time  # Part of the audio to copy, for when only part of the video is converted
+        self.audio_duration = audio_duration
+
+        self.process = None
+        self.closed = False
+        self.frame_shape = None
+
+        # Write to a unique temp file next to the output, so jobs never collide and
+        # a half written video never ends up at the output path
+        root, ext = os.path.splitext(output_path)
+        temp_fd, self.temp_output_path = tempfile.mkstemp(suffix=ext, prefix=os.path.basename(root) + "_",
+                                                          dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(temp_fd)
+
+    def _start(self, frame):
+        """
+        Starts ffmpeg for frames of the same size and channels as `frame`, shouldn't be called outside class.
+        """
+        self.frame_shape = frame.shape
+        height, width = frame.shape[:2]
+        channels = 1 if frame.ndim == 2 else frame.shape[2]
+
+        # Only needed once there is a video to write
+        from imageio_ffmpeg import get_ffmpeg_exe
+
+        command = [
+            get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", self.PIXEL_FORMATS[channels], "-s", f"{width}x{height}", "-r", f"{self.fps}", "-i", "-",
+        ]
+
+        if os.path.splitext(self.output_path)[1].lower() == ".gif":
+            if channels > 1:
+                command += ["-vf", "split[a][b];[a]palettegen=stats_mode=single[p];[b][p]paletteuse=new=1"]
+
+            command += ["-c:v", "gif", "-gifflags", "+offsetting+transdiff", "-loop", "0", self.temp_output_path]
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+            return
+
+        # Add the audio if there is any, copied as it is when the output can hold it
+        if self.audio_source_path is not None:
+            command += trimmed_input(self.audio_source_path, self.audio_start_time, self.audio_duration)
+            command += ["-map", "0:v:0", "-map", "1:a?", *audio_codec_arguments(self.audio_source_path), "-shortest"]
+
+        command += [
+            "-c:v", "libx264", "-preset", self.preset, "-pix_fmt", "yuv420p",
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            self.temp_output_path,
+        ]
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def append_data(self, frame):
+        """
+        Writes one frame, every frame must have the same size.
+        """
+        if self.process is None:
+            self._start(frame)
+
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"Frame of shape {frame.shape} given to writer of frames of shape {self.frame_shape}")
+
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+
+    def abort(self):
+        """
+        Stops ffmpeg without finishing the video and removes the temp file, for when something went wrong halfway.
+        Nothing is put at the output path.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self.process is not None:
+            self.process.kill()
+
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+            self.process.wait()
+
+        if os.path.exists(self.temp_output_path):
+            os.remove(self.temp_output_path)
+
+    def close(self):
+        """
+        Waits for ffmpeg to finish, then moves the video to the output path.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self.process is None:
+            os.remove(self.temp_output_path)
+            return
+
+        self.process.stdin.close()
+
+        if self.process.wait() != 0:
+            os.remove(self.temp_output_path)
+            raise RuntimeError(f"ffmpeg failed writing {self.output_path} with exit code {self.process.returncode}")
+
+        # mkstemp only lets the owner read the file, give it the permissions a normal new file would have
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(self.temp_output_path, 0o666 & ~umask)
+
+        os.replace(self.temp_output_path, self.output_path)
@@ -2,13 +2,221 @@
 Python file for Converter Class for converting image to ASCII characters.
 """
 
-import cairo
+from collections import OrderedDict
 import cv2
 import numpy as np
 import os
 import time
 
 from helper import bcolors
+from profiler import profile_stage
+
+
+# Every number from 0 to 255 as three ASCII digits, so colour escape codes all have the same width
+ANSI_DIGITS = np.array([list(f"{i:03d}".encode("ascii")) for i in range(256)], dtype=np.uint8)
+
+# Colour of every pixel value (quantized to 5 bits per channel) to the nearest xterm 256 colour, see `get_ansi_256_table`
+_ansi_256_table = None
+
+
+def get_ansi_256_table():
+    """
+    Returns a (32, 32, 32) table of the nearest xterm 256 colour palette index of every colour, indexed by
+    (red >> 3, green >> 3, blue >> 3), worked out once. Only the 6x6x6 cube and the gray ramp are used,
+    because terminals don't agree on what the first 16 colours look like.
+    """
+    global _ansi_256_table
+
+    if _ansi_256_table is None:
+        cube_levels = np.array([0, 95, 135, 175, 215, 255])
+        cube = np.stack(np.meshgrid(cube_levels, cube_levels, cube_levels, indexing="ij"), axis=-1).reshape(-1, 3)
+        grays = np.repeat(8 + 10 * np.arange(24), 3).reshape(-1, 3)
+        palette = np.concatenate((cube, grays)).astype(np.int32)
+
+        # Middle of every 5 bit bin
+        centres = (np.arange(32) << 3) + 4
+        table = np.empty((32, 32, 32), dtype=np.uint8)
+
+        for red in range(32):
+            colours = np.stack(np.meshgrid([centres[red]], centres, centres, indexing="ij"), axis=-1).reshape(-1, 1, 3)
+            distances = ((colours - palette) ** 2).sum(axis=2)
+            table[red] = (16 + distances.argmin(axis=1)).reshape(32, 32)
+
+        _ansi_256_table = table
+
+    return _ansi_256_table
+
+
+def _dirty_row_runs(dirty_rows):
+    """
+    Returns (start, end) of every run of consecutive True in `dirty_rows`, grown by one row both ways
+    because glyphs overlap into the rows above and below them.
+    """
+    grown = dirty_rows.copy()
+    grown[1:] |= dirty_rows[:-1]
+    grown[:-1] |= dirty_rows[1:]
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], grown, [False])).astype(np.int8)))
+    return list(zip(edges[0::2], edges[1::2]))
+
+
+class GlyphAtlas:
+    """
+    Every character of a gscale rasterized once with Cairo, so that frames can be
+    built by copying tiles around instead of shaping text.
+    """
+
+    def __init__(self, gscale: str, fontsize: int, line_spacing: float, font_face: str="Consolas") -> None:
+        self.gscale = gscale
+        self.fontsize = fontsize
+
+        # Cairo is only imported once something is rendered, so text only runs start faster
+        import cairo
+
+        # Measure the font the same way the Cairo renderer does
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
+        cairo_context = cairo.Context(surface)
+        cairo_context.set_font_size(fontsize)
+        cairo_context.select_font_face(font_face, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+
+        extents = cairo_context.text_extents(gscale)
+        self.line_height = extents.height
+        self.cell_width = max(1, round(extents.x_advance / len(gscale)))
+        self.cell_height = max(1, round(self.line_height * line_spacing))
+
+        # Tiles are three cells tall, so the parts of a glyph that stick out above or below its own cell are kept
+        tile_height = 3 * self.cell_height
+        tile_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, self.cell_width, tile_height)
+        tile_context = cairo.Context(tile_surface)
+        tile_context.set_font_size(fontsize)
+        tile_context.select_font_face(font_face, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        stride = tile_surface.get_stride()
+
+        # Tiles are stored as (band, glyph, cell_height, cell_width), band 0 is above the cell, 1 the cell, 2 below it
+        self.tiles = np.empty((3, len(gscale), self.cell_height, self.cell_width), dtype=np.uint8)
+
+        for i, char in enumerate(gscale):
+            tile_context.rectangle(0, 0, self.cell_width, tile_height)
+            tile_context.set_source_rgb(1, 1, 1)
+            tile_context.fill()
+
+            tile_context.set_source_rgb(0, 0, 0)
+            tile_context.move_to(0, self.cell_height * 1.5)
+            tile_context.show_text(char)
+            tile_surface.flush()
+
+            tile = np.ndarray(shape=(tile_height, stride), dtype=np.uint8, buffer=tile_surface.get_data())
+            self.tiles[:, i] = tile[:, 0:self.cell_width * 4:4].reshape(3, self.cell_height, self.cell_width)
+
+        self.overflows_up = bool((self.tiles[0] < 255).any())
+        self.overflows_down = bool((self.tiles[2] < 255).any())
+
+    def _place(self, band: int, indices):
+        """
+        Builds a grayscale image from one band of tiles, with fancy indexing over the index grid.
+        """
+        rows, columns = indices.shape
+        return self.tiles[band][indices].transpose(0, 2, 1, 3).reshape(rows * self.cell_height, columns * self.cell_width)
+
+    def coverage_descriptors(self, grid_size: int=4):
+        """
+        Returns how much of each of the `grid_size` x `grid_size` parts of its cell every glyph covers with ink,
+        as a (glyphs, grid_size * grid_size) float32 array from 0 (empty) to 1 (all ink).
+        """
+        coverage = 1 - self.tiles[1].astype(np.float32) / 255
+        parts = [cv2.resize(tile, (grid_size, grid_size), interpolation=cv2.INTER_AREA) for tile in coverage]
+        return np.stack(parts).reshape(len(self.gscale), grid_size * grid_size)
+
+    def render_rows(self, indices, row_start: int=0, row_end: int=None):
+        """
+        Renders rows `row_start` to `row_end` of the index grid as a grayscale image,
+        including the bits of glyphs from neighbouring rows that overlap into them.
+        """
+        rows = indices.shape[0]
+        row_end = rows if row_end is None else row_end
+
+        canvas = self._place(1, indices[row_start:row_end])
+
+        # Glyphs from the row below poking up into these rows
+        if self.overflows_up and row_start + 1 < rows:
+            overlap = self._place(0, indices[row_start + 1:min(row_end + 1, rows)])
+            np.minimum(canvas[:overlap.shape[0]], overlap, out=canvas[:overlap.shape[0]])
+
+        # Glyphs from the row above hanging down into these rows
+        if self.overflows_down and row_end - 1 > 0:
+            source_start = max(row_start - 1, 0)
+            overlap = self._place(2, indices[source_start:row_end - 1])
+            offset = (source_start + 1 - row_start) * self.cell_height
+            np.minimum(canvas[offset:offset + overlap.shape[0]], overlap, out=canvas[offset:offset + overlap.shape[0]])
+
+        return canvas
+
+
+class RenderLayout:
+    """
+    Sizes, Cairo surface and context for rendering a grid of `columns` x `rows` characters in one font,
+    worked out once and reused by `IMG2ASCIIConverter.create_image` for as long as it is cached.
+    """
+
+    def __init__(self, columns: int, rows: int, font_face: str, fontsize: int, gscale: str,
+                 canvas_height_increase: float, line_height_increase: float, margin_top: int) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.font_face = font_face
+        self.fontsize = fontsize
+        self.gscale = gscale
+        self.line_spacing = canvas_height_increase * line_height_increase
+        self.glyph_atlas = None  # Set by the converter when rendering with the glyph atlas
+
+        # What was rendered last, for only redrawing what changed, see `IMG2ASCIIConverter.set_incremental_render`
+        self.previous_lines = None
+        self.previous_indices = None
+        self.atlas_canvas = None
+        self.previous_output = None
+
+        # Cairo is only imported once something is rendered, so text only runs start faster
+        import cairo
+
+        # Measure with every character of the gscale, so the size doesn't depend on what is in the frame
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
+        cairo_context = cairo.Context(surface)
+        cairo_context.set_font_size(fontsize)
+        cairo_context.select_font_face(font_face, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        extents = cairo_context.text_extents(gscale)
+
+        self.line_height = extents.height
+        self.canvas_width = max(1, int(extents.x_advance / len(gscale) * columns))
+        self.canvas_height = max(1, int(margin_top + self.line_height * rows * canvas_height_increase))
+
+        # Surface that is going to be drawn on every time, and the array over its pixels
+        self.cairo_context_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, self.canvas_width, self.canvas_height)
+        self.cairo_context = cairo.Context(self.cairo_context_surface)
+        self.cairo_context.set_font_size(fontsize)
+        self.cairo_context.select_font_face(font_face, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+
+        stride = self.cairo_context_surface.get_stride()
+        self.canvas = np.ndarray(shape=(self.canvas_height, stride // 4, 4), dtype=np.uint8,
+                                 buffer=self.cairo_context_surface.get_data())[:, :self.canvas_width]
+
+    def line_y(self, i: int):
+        """
+        Returns the y position of the baseline of line `i`.
+        """
+        return self.line_height * (i + 0.5) * self.line_spacing
+
+    def line_top(self, i: int):
+        """
+        Returns the y position of the top of the band of line `i`, which is also the bottom of line `i - 1`.
+        """
+        return self.line_height * i * self.line_spacing
+
+    def finish(self):
+        """
+        Lets go of the Cairo surface, the layout can't be drawn on after this.
+        """
+        self.canvas = None
+        self.cairo_context = None
+        self.cairo_context_surface.finish()
 
 
 class IMG2ASCIIConverter:
@@ -21,6 +229,8 @@ class IMG2ASCIIConverter:
         self.image_path = ""
         self.image_array = None
         self.image_ascii_chars = ""
+        self.image_ascii_indices = None  # Index of each character in `self.image_ascii_gscale`
+        self.image_ascii_gscale = ""
         self.ascii_image_array = None
 
         # Image variables for scaling purposes
@@ -28,6 +238,7 @@ class IMG2ASCIIConverter:
         self.original_height = -1
         self.image_width = -1
         self.image_height = -1
+        self.scaled_image_buffer = None  # Reused by `scale_image` so scaling video frames doesn't allocate
 
         # ASCII chars count of width / height whichever one is smaller
         self.horizontal_ascii_chars_count = 100
@@ -40,16 +251,52 @@ class IMG2ASCIIConverter:
         self.LINE_HEIGHT_INCREASE_PERCENTAGE = 1.00
         self.FONTSIZE_CALC_CONSTANT = 3200
         self.CANVAS_HEIGHT_MARGIN_TOP = -2
+        self.FONT_FACE = "Consolas"
+
+        # Size of the characters (0 works it out from the character count) and whether the image is
+        # resized to the original size afterwards, see `set_render_size`
+        self.render_fontsize = 0
+        self.resize_output = True
+
+        # Layouts of recently used grid sizes and fonts, least recently used first
+        self.RENDER_LAYOUT_CACHE_SIZE = 8
+        self.render_layouts = OrderedDict()
 
         self.canvas_width = -1
         self.canvas_height = -1
         self.line_height = -1
 
+        # Rendering backend, either "cairo" (show_text per line) or "atlas" (pre-rasterized glyph tiles)
+        self.render_backend = "cairo"
+        self.glyph_atlases = {}
+
+        # Only redraw the characters that changed since the last image, see `set_incremental_render`
+        self.incremental_render = False
+
+        # Records how long every stage takes if set, see `set_profiler`
+        self.profiler = None
+
         self.gscale = [
             r'$@B%8&WM#*oahkbdpqwmZO0QLCJUYXzcvunxrjft/\|()1{}[]?-_+~i!lI;:,"^`. ',
             "@%#*+=-:. ",
         ]
 
+        # Pixel value to gscale index lookup tables, see `_get_gscale_lookup_table`
+        self._gscale_lookup_tables = {}
+
+        # Picking characters by their shape as well as their brightness, see `set_shape_matching`
+        self.shape_matching = False
+        self.SHAPE_GRID_SIZE = 4
+        self.SHAPE_FONTSIZE = 48
+        self.detail_scale = 1  # Pixels of `self.image_array` per character each way, set by `scale_image`
+        self._glyph_descriptors = {}
+
+        # Colour stuff, see `set_colour`
+        self.colour = False
+        self.colour_palette = "truecolor"
+        self.cell_colours = None  # Mean BGR colour of every character, set by `scale_image`
+        self.scaled_colour_buffer = None
+
     # Basic functions
     def set_image(self, image_path: str):
         """
@@ -64,11 +311,15 @@ class IMG2ASCIIConverter:
             )
             return False
 
-        # Read image in grayscale
+        # Read image in grayscale, or in colour for `scale_image` to take the colours of the characters from
         self.image_path = image_path
-        self.image_array = cv2.imread(image_path, 0)
-        self.image_height, self.image_width = self.image_array.shape
-        self.original_height, self.original_width = self.image_array.shape
+
+        with profile_stage(self.profiler, "decode"):
+            self.image_array = cv2.imread(image_path, cv2.IMREAD_COLOR if self.colour else cv2.IMREAD_GRAYSCALE)
+
+        self.image_height, self.image_width = self.image_array.shape[:2]
+        self.original_height, self.original_width = self.image_array.shape[:2]
+        self.detail_scale = 1
         return True
 
     def set_image_by_array(self, image_array):
@@ -77,8 +328,13 @@ class IMG2ASCIIConverter:
 
         Returns True is image_array is set successfully.
         """
+        # In colour the BGR image is kept until `scale_image`
+        if self.colour and len(image_array.shape) == 3:
+            if image_array.shape[2] == 4:
+                image_array = cv2.cvtColor(image_array, cv2.COLOR_BGRA2BGR)
+
         # Check if image is in grayscale
-        if len(image_array.shape) == 3:
+        elif len(image_array.shape) == 3:
             print(f"{bcolors.WARNING}[!] Image is not in grayscale {bcolors.ENDC} *o*")
             print(f"{bcolors.WARNING}[!] Trying to convert image from BGR format to grayscale :/ {bcolors.ENDC}\n")
 
@@ -92,8 +348,9 @@ class IMG2ASCIIConverter:
 
         # Set image to given array
         self.image_array = image_array
-        self.image_height, self.image_width = self.image_array.shape
-        self.original_height, self.original_width = self.image_array.shape
+        self.image_height, self.image_width = self.image_array.shape[:2]
+        self.original_height, self.original_width = self.image_array.shape[:2]
+        self.detail_scale = 1
         return True
 
     def set_ascii_chars_count(self, horizontal: int, vertical: int):
@@ -106,6 +363,85 @@ class IMG2ASCIIConverter:
         """
         self.horizontal_ascii_chars_count, self.vertical_ascii_chars_count = horizontal, vertical
 
+    def set_render_backend(self, backend: str):
+        """
+        Sets the backend used by `create_image`, either "cairo" or "atlas".
+
+        "cairo" draws every line of text with Cairo, "atlas" rasterizes every character
+        once and builds frames from those tiles, which is a lot faster for video.
+
+        Returns True if backend is set successfully.
+        """
+        if backend not in ("cairo", "atlas"):
+            print(f"{bcolors.WARNING}[-] Unknown render backend '{backend}', pick cairo or atlas 0.o {bcolors.ENDC}\n")
+            return False
+
+        self.render_backend = backend
+        return True
+
+    def set_incremental_render(self, incremental: bool=True):
+        """
+        Makes `create_image` only redraw the characters (or with Cairo, lines of characters) that
+        are different from the last image of the same size, instead of the whole thing.
+
+        For video this makes rendering cost about as much as there is motion.
+        """
+        self.incremental_render = incremental
+
+    def set_render_size(self, fontsize: int=0, resize_output: bool=True):
+        """
+        Sets the font size `create_image` draws the characters at, 0 works it out from the character count
+        so the image comes out at about the same size for any count.
+
+        Without `resize_output`, the image is kept at the size it is drawn at (which only depends on the grid
+        and the font size) instead of being resized to the size of the original image.
+        """
+        self.render_fontsize = fontsize
+        self.resize_output = resize_output
+
+    def _get_fontsize(self, upscale: int=1):
+        """
+        Returns the font size characters are drawn at, shouldn't be called outside class.
+        """
+        fontsize = self.render_fontsize if self.render_fontsize > 0 else self.FONTSIZE_CALC_CONSTANT // self.horizontal_ascii_chars_count
+        return fontsize * upscale
+
+    def set_profiler(self, profiler):
+        """
+        Records the time of reading the image in `set_image`, `scale_image`, `create_text`, `create_image`
+        and resizing the output to a `profiler.StageProfiler`, None stops recording.
+        """
+        self.profiler = profiler
+
+    def set_shape_matching(self, shape_matching: bool=True):
+        """
+        Picks the character of every cell by how well its shape matches the cell instead of only by brightness,
+        so edges and lines stay sharp with about half as many characters.
+
+        `scale_image` then keeps `self.SHAPE_GRID_SIZE` x `self.SHAPE_GRID_SIZE` pixels for every character,
+        and `create_text` finds the glyph of the gscale whose ink covers those parts the most alike. Glyphs are
+        drawn with Cairo once per gscale to work out what they cover.
+        """
+        self.shape_matching = shape_matching
+
+    def set_colour(self, colour: bool=True, palette: str="truecolor"):
+        """
+        Colours every character with the mean colour of the part of the image it stands for.
+
+        Images are then kept in BGR until `scale_image`, which takes the colours and the grayscale
+        from one resize, `create_image` tints the characters and `create_ansi_text` gives the
+        text with terminal colour codes, of either the "truecolor" or the "256" colour `palette`.
+
+        Returns True if colour is set successfully.
+        """
+        if palette not in ("truecolor", "256"):
+            print(f"{bcolors.WARNING}[-] Unknown colour palette '{palette}', pick truecolor or 256 0.o {bcolors.ENDC}\n")
+            return False
+
+        self.colour = colour
+        self.colour_palette = palette
+        return True
+
     def show_image(self):
         """
         Shows image that is currently loaded to self.
@@ -133,32 +469,94 @@ class IMG2ASCIIConverter:
             int(self.image_height * scale_ratio_y)),
             interpolation=cv2.INTER_AREA,
         )
-        self.image_height, self.image_width = self.image_array.shape
+        self.image_height, self.image_width = self.image_array.shape[:2]
         return self.image_array
 
+    def get_scaled_size(self):
+        """
+        Returns the (width, height) that `scale_image` will scale the image to,
+        which is also the number of ASCII characters widthwise and heightwise.
+        """
+        # Stretch by `font_width_to_height_ratio` because ASCII chars are not of same width and height
+        font_width_to_height_ratio = 5 / 2
+        stretched_width = int(self.image_width * font_width_to_height_ratio)
+
+        # Then fit to horizontal or vertical ascii chars count
+        scale_ratio = min((self.horizontal_ascii_chars_count / stretched_width), 
+                          (self.vertical_ascii_chars_count / self.image_height))
+
+        return int(stretched_width * scale_ratio), int(self.image_height * scale_ratio)
+
     def scale_image(self):
         """
         Scales image to appropriate size before converting image to ASCII characters.
 
+        The image is resized once, straight to the size given by `get_scaled_size`, into a buffer that is
+        reused every time the size stays the same (e.g. every frame of a video), so don't hold on to
+        the returned image after setting the next one.
+
+        With shape matching on, 8 bit images are scaled to `self.SHAPE_GRID_SIZE` pixels per character each way instead.
+
         Returns scaled image.
         """
-        # Check if image_array exists
-        if self.image_array is None:
-            print(f"{bcolors.WARNING}[!] No image has been set yet /_ \ {bcolors.ENDC}\n")
-            return
+        with profile_stage(self.profiler, "scale_image"):
+            # Check if image_array exists
+            if self.image_array is None:
+                print(f"{bcolors.WARNING}[!] No image has been set yet /_ \ {bcolors.ENDC}\n")
+                return
 
-        # Scale image by `font_width_to_height_ratio` because ASCII chars are not of same width and height
-        font_width_to_height_ratio = 5 / 2
+            width, height = self.get_scaled_size()
+            self.detail_scale = self.SHAPE_GRID_SIZE if self.shape_matching and self.image_array.dtype == np.uint8 else 1
+            detail_width, detail_height = width * self.detail_scale, height * self.detail_scale
 
-        self.scale_image_by_ratio(font_width_to_height_ratio, 1)
+            # Only make a new buffer if the size changed, and never resize from the buffer into itself
+            buffer = self.scaled_image_buffer
 
-        # Scale image to horizontal or vertical ascii chars count
-        scale_ratio = min((self.horizontal_ascii_chars_count / self.image_width), 
-                          (self.vertical_ascii_chars_count / self.image_height))
+            if (buffer is None or buffer.shape != (detail_height, detail_width) or buffer.dtype != self.image_array.dtype
+                    or np.shares_memory(buffer, self.image_array)):
+                buffer = np.empty((detail_height, detail_width), dtype=self.image_array.dtype)
 
-        self.scale_image_by_ratio(scale_ratio, scale_ratio)
+            if self.image_array.ndim == 3:
+                # One resize of the colour image gives the mean colour of every character, and the grayscale comes from that
+                colour_buffer = self.scaled_colour_buffer
 
-        return self.image_array
+                if (colour_buffer is None or colour_buffer.shape != (detail_height, detail_width, 3) or colour_buffer.dtype != self.image_array.dtype
+                        or np.shares_memory(colour_buffer, self.image_array)):
+                    colour_buffer = np.empty((detail_height, detail_width, 3), dtype=self.image_array.dtype)
+
+                detail_colours = cv2.resize(self.image_array, (detail_width, detail_height), dst=colour_buffer, interpolation=cv2.INTER_AREA)
+                self.scaled_colour_buffer = detail_colours
+                self.image_array = cv2.cvtColor(detail_colours, cv2.COLOR_BGR2GRAY, dst=buffer)
+            else:
+                self.image_array = cv2.resize(self.image_array, (detail_width, detail_height), dst=buffer, interpolation=cv2.INTER_AREA)
+
+                # Grayscale images in colour are just gray
+                detail_colours = cv2.cvtColor(self.image_array, cv2.COLOR_GRAY2BGR) if self.colour else None
+
+            # Every character has one colour, the mean of its pixels
+            if detail_colours is not None and self.detail_scale > 1:
+                self.cell_colours = cv2.resize(detail_colours, (width, height), interpolation=cv2.INTER_AREA)
+            elif detail_colours is not None:
+                self.cell_colours = detail_colours
+
+            self.scaled_image_buffer = self.image_array
+            self.image_height, self.image_width = self.image_array.shape
+
+            return self.image_array
+
+    def get_output_size(self, target_w: int=1280, target_h: int=720):
+        """
+        Returns the (width, height) that `create_image` will resize the ASCII image to.
+
+        That is the original size, unless the original is too smol, then it is whichever
+        resolution with the same aspect ratio is nearest to `target_w` x `target_h`.
+        """
+        if self.original_width > 800 or self.original_height > 600:
+            return self.original_width, self.original_height
+
+        scale_ratio = max((target_w / self.original_width), (target_h / self.original_height))
+
+        return int(self.original_width * scale_ratio), int(self.original_height * scale_ratio)
 
     def _scale_ascii_image_for_output(self, target_w: int=1280, target_h:int=720):
         """
@@ -166,9 +564,7 @@ class IMG2ASCIIConverter:
 
         Shouldn't be called outside class.
         """
-        scale_ratio = max((target_w / self.original_width), (target_h / self.original_height))
-
-        self.ascii_image_array = cv2.resize(self.ascii_image_array, (int(self.original_width * scale_ratio), int(self.original_height * scale_ratio)), interpolation=cv2.INTER_AREA)
+        self.ascii_image_array = cv2.resize(self.ascii_image_array, self.get_output_size(target_w, target_h), interpolation=cv2.INTER_AREA)
 
         return self.ascii_image_array
         
@@ -178,21 +574,211 @@ class IMG2ASCIIConverter:
 
         @param gscale_level: For choosing which grayscale ASCII characters to use.
         """
-        # Check if text exists
-        if self.image_array is None:
-            print(f"{bcolors.WARNING}[!] No image has been set yet :< {bcolors.ENDC}\n")
-            return ""
+        with profile_stage(self.profiler, "create_text"):
+            # Check if text exists
+            if self.image_array is None:
+                print(f"{bcolors.WARNING}[!] No image has been set yet :< {bcolors.ENDC}\n")
+                return ""
 
-        # Make sure the gscale_level is not out of range
-        gscale = self.gscale[gscale_level % len(self.gscale)]
+            # Make sure the gscale_level is not out of range
+            gscale = self.gscale[gscale_level % len(self.gscale)]
+
+            # Colour images that weren't scaled yet
+            if self.image_array.ndim == 3:
+                self.image_array = cv2.cvtColor(self.image_array, cv2.COLOR_BGR2GRAY)
+
+            # Anything that isn't 8 bit can't go through the lookup table, so do it the slow way
+            if self.image_array.dtype != np.uint8:
+                return self._create_text_by_loop(gscale, max_bit_value, min_bit_value)
+
+            if self.detail_scale > 1:
+                indices = self._match_glyph_shapes(gscale)
+            else:
+                index_table, valid_table = self._get_gscale_lookup_table(gscale, max_bit_value, min_bit_value)
+
+                # Map every pixel to its gscale index in one go
+                indices = index_table[self.image_array]
+
+                # Same as indexing a string out of range in the loop version
+                if not valid_table.all() and not valid_table[self.image_array].all():
+                    raise IndexError("string index out of range")
+
+            self.image_ascii_indices = indices
+            self.image_ascii_gscale = gscale
+            self.image_ascii_chars = self._indices_to_text(indices, gscale)
+
+            return self.image_ascii_chars
+
+    def _create_text_by_loop(self, gscale: str, max_bit_value: int=256, min_bit_value: int=0):
+        """
+        Original per pixel version of `create_text`, used for non 8 bit images.
+
+        Shouldn't be called outside class.
+        """
         gscale_length = len(gscale)
 
         chars = '\n'.join([''.join([gscale[int((j / (max_bit_value - min_bit_value) + min_bit_value) * gscale_length)] for j in i]) for i in self.image_array])
 
+        self.image_ascii_indices = None
+        self.image_ascii_gscale = gscale
         self.image_ascii_chars = chars
 
         return chars
+
+    def _get_gscale_lookup_table(self, gscale: str, max_bit_value: int=256, min_bit_value: int=0):
+        """
+        Returns a 256 entry table mapping pixel value to gscale index, and a table of
+        which pixel values actually have a valid index, cached per gscale and bit values.
+
+        Shouldn't be called outside class.
+        """
+        key = (gscale, max_bit_value, min_bit_value)
+
+        if key not in self._gscale_lookup_tables:
+            gscale_length = len(gscale)
+            index_table = np.zeros(256, dtype=np.uint8)
+            valid_table = np.ones(256, dtype=bool)
+
+            # Same expression as the loop version so that the output is exactly the same
+            for j in range(256):
+                index = int((j / (max_bit_value - min_bit_value) + min_bit_value) * gscale_length)
+
+                if -gscale_length <= index < gscale_length:
+                    index_table[j] = index % gscale_length
+                else:
+                    valid_table[j] = False
+
+            self._gscale_lookup_tables[key] = (index_table, valid_table)
+
+        return self._gscale_lookup_tables[key]
+
+    def _get_glyph_descriptors(self, gscale: str):
+        """
+        Returns the coverage of every glyph of `gscale` as a (glyphs, `SHAPE_GRID_SIZE` squared) array scaled so the
+        densest glyph is as dark as a black cell, and the squared length of each, cached per gscale.
+
+        Shouldn't be called outside class.
+        """
+        key = (gscale, self.SHAPE_GRID_SIZE)
+
+        if key not in self._glyph_descriptors:
+            line_spacing = self.CANVAS_HEIGHT_INCREASE_PERCENTAGE * self.LINE_HEIGHT_INCREASE_PERCENTAGE
+            coverage = GlyphAtlas(gscale, self.SHAPE_FONTSIZE, line_spacing, self.FONT_FACE).coverage_descriptors(self.SHAPE_GRID_SIZE)
+
+            # On the same 0 - 255 scale as how dark the pixels of a cell are
+            descriptors = coverage * (255 / max(coverage.mean(axis=1).max(), 1e-6))
+            self._glyph_descriptors[key] = (descriptors, (descriptors ** 2).sum(axis=1))
+
+        return self._glyph_descriptors[key]
+
+    def _match_glyph_shapes(self, gscale: str):
+        """
+        Returns the grid of gscale indices of the glyphs nearest in shape to every cell of the scaled image,
+        all cells at once, shouldn't be called outside class.
+        """
+        descriptors, squared_lengths = self._get_glyph_descriptors(gscale)
+        scale = self.detail_scale
+        rows, columns = self.image_array.shape[0] // scale, self.image_array.shape[1] // scale
+
+        # How dark every part of every cell is, laid out the same as the descriptors
+        cells = self.image_array.reshape(rows, scale, columns, scale).transpose(0, 2, 1, 3).reshape(rows * columns, scale * scale)
+        darkness = 255 - cells.astype(np.float32)
+
+        # Nearest by squared distance, leaving out the length of the cell itself since it is the same for every glyph
+        distances = squared_lengths - 2 * darkness @ descriptors.T
+
+        return distances.argmin(axis=1).astype(np.uint8).reshape(rows, columns)
+
+    def _indices_to_text(self, indices, gscale: str):
+        """
+        Turns a grid of gscale indices into lines of text without looping through every pixel.
+
+        Shouldn't be called outside class.
+        """
+        rows, columns = indices.shape
+
+        # One more column for the newline at the end of each line
+        if gscale.isascii():
+            char_codes = np.frombuffer(gscale.encode("ascii"), dtype=np.uint8)
+            text_array = np.empty((rows, columns + 1), dtype=np.uint8)
+            encoding = "ascii"
+        else:
+            char_codes = np.frombuffer(gscale.encode("utf-32-le"), dtype="<u4")
+            text_array = np.empty((rows, columns + 1), dtype="<u4")
+            encoding = "utf-32-le"
+
+        text_array[:, :columns] = char_codes[indices]
+        text_array[:, columns] = ord("\n")
+
+        return text_array.tobytes().decode(encoding)[:-1]
         
+    def create_ansi_text(self, palette: str=""):
+        """
+        Returns the ASCII characters with terminal escape codes that colour every character, call
+        `create_text` in colour first. Every character gets an escape code of the same width,
+        so the whole text is put together in one go.
+
+        @param palette: "truecolor" for 24 bit colour or "256" for the xterm 256 colour palette,
+        defaults to the palette given to `set_colour`.
+        """
+        palette = palette if palette != "" else self.colour_palette
+        indices = self.image_ascii_indices
+
+        if indices is None or self.cell_colours is None or self.cell_colours.shape[:2] != indices.shape:
+            print(f"{bcolors.WARNING}[!] No colours to write, try set colour then create text first :3 {bcolors.ENDC}\n")
+            return ""
+
+        gscale = self.image_ascii_gscale
+        rows, columns = indices.shape
+
+        if palette == "256":
+            prefix = b"\033[38;5;"
+            table = get_ansi_256_table()
+            colour_codes = ANSI_DIGITS[table[self.cell_colours[..., 2] >> 3, self.cell_colours[..., 1] >> 3, self.cell_colours[..., 0] >> 3]]
+        else:
+            prefix = b"\033[38;2;"
+            red, green, blue = ANSI_DIGITS[self.cell_colours[..., 2]], ANSI_DIGITS[self.cell_colours[..., 1]], ANSI_DIGITS[self.cell_colours[..., 0]]
+            separators = np.full((rows, columns, 1), ord(";"), dtype=np.uint8)
+            colour_codes = np.concatenate((red, separators, green, separators, blue), axis=2)
+
+        # Every cell is prefix, colour, "m" then the character, with a newline after every row
+        if gscale.isascii():
+            char_codes = np.frombuffer(gscale.encode("ascii"), dtype=np.uint8)
+            dtype, encoding = np.uint8, "ascii"
+        else:
+            char_codes = np.frombuffer(gscale.encode("utf-32-le"), dtype="<u4")
+            dtype, encoding = np.dtype("<u4"), "utf-32-le"
+
+        cell_width = len(prefix) + colour_codes.shape[2] + 2
+        cells = np.empty((rows, columns, cell_width), dtype=dtype)
+        cells[..., :len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+        cells[..., len(prefix):-2] = colour_codes
+        cells[..., -2] = ord("m")
+        cells[..., -1] = char_codes[indices]
+
+        text_array = np.empty((rows, columns * cell_width + 1), dtype=dtype)
+        text_array[:, :-1] = cells.reshape(rows, -1)
+        text_array[:, -1] = ord("\n")
+
+        return text_array.tobytes().decode(encoding)[:-1] + "\033[0m"
+
+    def set_ascii_indices(self, indices, gscale: str, original_width: int=-1, original_height: int=-1):
+        """
+        Sets the ASCII characters from a grid of indices into `gscale`, e.g. a frame read from an ASCII video archive,
+        instead of creating them from an image.
+
+        `original_width` and `original_height` are the size of the image the characters came from,
+        which `create_image` scales the output to.
+        """
+        self.image_ascii_indices = indices
+        self.image_ascii_gscale = gscale
+        self.image_ascii_chars = self._indices_to_text(indices, gscale)
+
+        if original_width > 0 and original_height > 0:
+            self.original_width, self.original_height = original_width, original_height
+
+        return self.image_ascii_chars
+
     def write_to_text_file(self, text_file_path: str=""):
         """
         Writes the ASCII characters text to the file path specified.
@@ -224,6 +810,32 @@ class IMG2ASCIIConverter:
 
         return True
 
+    def write_to_ansi_file(self, ansi_file_path: str=""):
+        """
+        Writes the ASCII characters with terminal colour codes from `create_ansi_text` to the file path specified,
+        which shows in colour with e.g. `cat`.
+
+        If no file path is provided, then the output path will be the original one with _ascii.ans
+
+        Returns True if write succesful.
+        """
+        if ansi_file_path == "":
+            ansi_file_path = os.path.splitext(self.image_path)[0] + "_ascii.ans"
+
+        ansi_text = self.create_ansi_text()
+
+        if ansi_text == "":
+            return False
+
+        print(f"{bcolors.WARNING}[!] Writing to ANSI file of path {ansi_file_path} :3 {bcolors.ENDC}\n")
+
+        with open(ansi_file_path, mode='w') as f:
+            f.write(ansi_text)
+
+        print(f"{bcolors.WARNING}[+] Finished writing to ANSI file of path {ansi_file_path} ·v· {bcolors.ENDC}\n")
+
+        return True
+
     def create_image(self, upscale: int=1):
         """
         Creates image from `self.image_ascii_chars`, 
@@ -236,58 +848,221 @@ class IMG2ASCIIConverter:
             print(f"{bcolors.WARNING}[!] Nothing to write when creating image, try create text first :3 {bcolors.ENDC}\n")
             return False
 
-        # Set up font size, and stuff
-        fontsize = self.FONTSIZE_CALC_CONSTANT // self.horizontal_ascii_chars_count * upscale
-        lines = self.image_ascii_chars
-
-        # Calculate the size that the created surface should have when running for the first time
-        if self.cairo_context is None:
-            temp_width, temp_height = 1000, 1000
-            surface = cairo.ImageSurface(cairo.FORMAT_RGB24, temp_width, temp_height)
-            cairo_context = cairo.Context(surface)
-            cairo_context.rectangle(0, 0, temp_width, temp_height)
-            cairo_context.set_source_rgb(1, 1, 1)
-            cairo_context.fill()
-
-            cairo_context.set_source_rgb(0, 0, 0)
-            cairo_context.set_font_size(fontsize)
-            cairo_context.select_font_face("Consolas", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
-
-            self.canvas_width = int(cairo_context.text_extents(lines.split('\n')[0]).width)
-            self.line_height = cairo_context.text_extents(lines).height
-            self.canvas_height = int(self.CANVAS_HEIGHT_MARGIN_TOP + self.line_height * (len(lines.split('\n'))) * self.CANVAS_HEIGHT_INCREASE_PERCENTAGE)
-        
-        # Then create a surface that is going to be used by the function
-        if self.cairo_context_surface is None:
-            self.cairo_context_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, self.canvas_width, self.canvas_height)
-            self.cairo_context = cairo.Context(self.cairo_context_surface)
-            self.cairo_context.set_font_size(fontsize)
-            self.cairo_context.select_font_face("Consolas", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
-
-        # Clear surface for writing
-        self.cairo_context.rectangle(0, 0, self.canvas_width, self.canvas_height)
-        self.cairo_context.set_source_rgb(1, 1, 1)
-        self.cairo_context.fill()
-
-        # Start writing line
-        self.cairo_context.set_source_rgb(0, 0, 0)
-
-        for i, line in enumerate(lines.split('\n')):
-            self.cairo_context.move_to(0, self.line_height * (i + 0.5) * self.CANVAS_HEIGHT_INCREASE_PERCENTAGE * self.LINE_HEIGHT_INCREASE_PERCENTAGE)
-            self.cairo_context.show_text(line)
-
-        # Create array from Cairo context
-        self.ascii_image_array = np.ndarray(shape=(self.canvas_height, self.canvas_width, 4), dtype=np.uint8, buffer=self.cairo_context_surface.get_data())
-        
+        with profile_stage(self.profiler, "create_image"):
+            # Set up font size, and render with whichever backend is chosen
+            fontsize = self._get_fontsize(upscale)
+
+            if self.render_backend == "atlas":
+                layout, changed = self._create_image_by_glyph_atlas(fontsize)
+            else:
+                layout, changed = self._create_image_by_cairo(fontsize)
+
+            # The colours can change without the characters changing, so those are put on every time
+            if self.colour:
+                self.ascii_image_array = self._tint_by_cell_colours(self.ascii_image_array)
+
+        # Kept at the size it was drawn at, copied if it is the canvas since the next image is drawn over that
+        if not self.resize_output:
+            if self.ascii_image_array is layout.canvas:
+                self.ascii_image_array = self.ascii_image_array.copy()
+            return True
+
+        # Nothing changed since the last image, so the last output can be used as it is
+        if not self.colour and not changed and layout.previous_output is not None and layout.previous_output.shape[1::-1] == self.get_output_size():
+            self.ascii_image_array = layout.previous_output
+            return True
+
         # We would scale the output to the original size, except for when the original size is too smol
         # Then we will esize it to to around 1280x720, find whichever resolution is closest
-        if self.original_width > 800 or self.original_height > 600:
-            self.ascii_image_array = cv2.resize(self.ascii_image_array, (self.original_width, self.original_height), interpolation=cv2.INTER_AREA)
-        else:
-            self._scale_ascii_image_for_output()
+        with profile_stage(self.profiler, "resize_output"):
+            if self.original_width > 800 or self.original_height > 600:
+                self.ascii_image_array = cv2.resize(self.ascii_image_array, (self.original_width, self.original_height), interpolation=cv2.INTER_AREA)
+            else:
+                self._scale_ascii_image_for_output()
+
+        if self.incremental_render:
+            layout.previous_output = self.ascii_image_array
 
         return True
 
+    def _tint_by_cell_colours(self, ascii_image_array):
+        """
+        Colours the black characters of a rendered BGRA image with the colour of their cell, all at once
+        by stretching the grid of colours over the image, shouldn't be called outside class.
+
+        Returns the tinted image, or the image as it is if there are no colours for this grid.
+        """
+        indices_shape = self.image_ascii_indices.shape if self.image_ascii_indices is not None else None
+
+        if self.cell_colours is None or self.cell_colours.shape[:2] != indices_shape:
+            return ascii_image_array
+
+        height, width = ascii_image_array.shape[:2]
+        colour_canvas = cv2.resize(self.cell_colours, (width, height), interpolation=cv2.INTER_NEAREST)
+
+        # White where there is no ink, the colour of the cell where the glyph is fully drawn
+        ink = cv2.cvtColor(cv2.bitwise_not(cv2.cvtColor(ascii_image_array, cv2.COLOR_BGRA2GRAY)), cv2.COLOR_GRAY2BGR)
+        tinted = cv2.bitwise_not(cv2.multiply(cv2.bitwise_not(colour_canvas), ink, scale=1 / 255))
+
+        return cv2.cvtColor(tinted, cv2.COLOR_BGR2BGRA)
+
+    def get_render_layout(self, columns: int, rows: int, fontsize: int, gscale: str):
+        """
+        Returns the `RenderLayout` for a grid of `columns` x `rows` characters, creating it if it isn't cached yet.
+
+        Layouts are cached by (columns, rows, font face, font size, gscale), and the least recently
+        used one is thrown away once there are more than `self.RENDER_LAYOUT_CACHE_SIZE`.
+        """
+        key = (columns, rows, self.FONT_FACE, fontsize, gscale)
+
+        if key in self.render_layouts:
+            self.render_layouts.move_to_end(key)
+        else:
+            self.render_layouts[key] = RenderLayout(columns, rows, self.FONT_FACE, fontsize, gscale,
+                                                    self.CANVAS_HEIGHT_INCREASE_PERCENTAGE,
+                                                    self.LINE_HEIGHT_INCREASE_PERCENTAGE,
+                                                    self.CANVAS_HEIGHT_MARGIN_TOP)
+
+            while len(self.render_layouts) > self.RENDER_LAYOUT_CACHE_SIZE:
+                _, evicted_layout = self.render_layouts.popitem(last=False)
+                evicted_layout.finish()
+
+        layout = self.render_layouts[key]
+
+        if self.render_backend == "atlas" and layout.glyph_atlas is None:
+            atlas_key = (gscale, fontsize)
+
+            if atlas_key not in self.glyph_atlases:
+                self.glyph_atlases[atlas_key] = GlyphAtlas(gscale, fontsize, layout.line_spacing, self.FONT_FACE)
+
+            layout.glyph_atlas = self.glyph_atlases[atlas_key]
+
+        return layout
+
+    def prepare_layout(self, columns: int, rows: int, gscale_level: int=0, upscale: int=1):
+        """
+        Works out the layout for a grid of `columns` x `rows` characters with the current ASCII chars count
+        ahead of time, so the first `create_image` of that size doesn't have to.
+
+        Returns the `RenderLayout`.
+        """
+        fontsize = self._get_fontsize(upscale)
+        gscale = self.gscale[gscale_level % len(self.gscale)]
+        return self.get_render_layout(columns, rows, fontsize, gscale)
+
+    def _use_render_layout(self, layout):
+        """
+        Points the Cairo and canvas variables of the converter at `layout`, shouldn't be called outside class.
+        """
+        self.cairo_context = layout.cairo_context
+        self.cairo_context_surface = layout.cairo_context_surface
+        self.canvas_width = layout.canvas_width
+        self.canvas_height = layout.canvas_height
+        self.line_height = layout.line_height
+
+    def _create_image_by_cairo(self, fontsize: int):
+        """
+        Renders `self.image_ascii_chars` line by line with Cairo into `self.ascii_image_array`,
+        only the lines that changed when rendering incrementally.
+
+        Returns the layout used, and whether anything was drawn. Shouldn't be called outside class.
+        """
+        lines = self.image_ascii_chars.split('\n')
+
+        layout = self.get_render_layout(len(lines[0]), len(lines), fontsize, self.image_ascii_gscale)
+        self._use_render_layout(layout)
+
+        # Work out which bands of lines to redraw, everything if not rendering incrementally
+        if self.incremental_render and layout.previous_lines is not None:
+            dirty_rows = np.array([line != previous_line for line, previous_line in zip(lines, layout.previous_lines)])
+            runs = _dirty_row_runs(dirty_rows)
+        else:
+            runs = [(0, len(lines))]
+
+        for start, end in runs:
+            self.cairo_context.save()
+
+            # Only touch the bands of the lines being redrawn
+            top = 0 if start == 0 else layout.line_top(start)
+            bottom = self.canvas_height if end == len(lines) else layout.line_top(end)
+            self.cairo_context.rectangle(0, top, self.canvas_width, bottom - top)
+            self.cairo_context.clip()
+
+            # Clear surface for writing
+            self.cairo_context.rectangle(0, top, self.canvas_width, bottom - top)
+            self.cairo_context.set_source_rgb(1, 1, 1)
+            self.cairo_context.fill()
+
+            # Start writing line, including the ones around that overlap into the band
+            self.cairo_context.set_source_rgb(0, 0, 0)
+
+            for i in range(max(start - 1, 0), min(end + 1, len(lines))):
+                self.cairo_context.move_to(0, layout.line_y(i))
+                self.cairo_context.show_text(lines[i])
+
+            self.cairo_context.restore()
+
+        self.cairo_context_surface.flush()
+
+        if self.incremental_render:
+            layout.previous_lines = lines
+
+        # Array over the Cairo surface
+        self.ascii_image_array = layout.canvas
+
+        return layout, len(runs) > 0
+
+    def _create_image_by_glyph_atlas(self, fontsize: int):
+        """
+        Renders `self.image_ascii_chars` by placing pre-rasterized glyph tiles into `self.ascii_image_array`,
+        only the tiles that changed when rendering incrementally.
+
+        Returns the layout used, and whether anything was drawn. Shouldn't be called outside class.
+        """
+        gscale = self.image_ascii_gscale
+        indices = self.image_ascii_indices
+
+        # Text made by the loop version has no index grid, so work it out from the text
+        if indices is None:
+            char_to_index = {char: i for i, char in reversed(list(enumerate(gscale)))}
+            indices = np.array([[char_to_index[char] for char in line] for line in self.image_ascii_chars.split('\n')], dtype=np.uint8)
+
+        layout = self.get_render_layout(indices.shape[1], indices.shape[0], fontsize, gscale)
+        self._use_render_layout(layout)
+        atlas = layout.glyph_atlas
+        changed = True
+
+        if self.incremental_render and layout.previous_indices is not None:
+            canvas = layout.atlas_canvas
+            changed_cells = indices != layout.previous_indices
+
+            if atlas.overflows_up or atlas.overflows_down:
+                # Glyphs overlap other rows, so redraw whole rows along with the rows around them
+                runs = _dirty_row_runs(changed_cells.any(axis=1))
+
+                for start, end in runs:
+                    canvas[start * atlas.cell_height:end * atlas.cell_height] = atlas.render_rows(indices, start, end)
+
+                changed = len(runs) > 0
+            else:
+                # Every glyph stays in its own cell, so just swap the tiles of the cells that changed
+                rows, columns = np.nonzero(changed_cells)
+                cells = canvas.reshape(indices.shape[0], atlas.cell_height, indices.shape[1], atlas.cell_width)
+                cells[rows, :, columns, :] = atlas.tiles[1][indices[rows, columns]]
+
+                changed = len(rows) > 0
+        else:
+            canvas = atlas.render_rows(indices)
+
+        if self.incremental_render:
+            layout.atlas_canvas = canvas
+            layout.previous_indices = indices.copy()
+
+        self.canvas_height, self.canvas_width = canvas.shape
+        self.ascii_image_array = cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGRA)
+
+        return layout, changed
+
     def write_to_image_file(self, image_file_path: str="", extension: str=""):
         """
         Writes the created image to the file path specified.
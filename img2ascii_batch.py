@@ -0,0 +1,213 @@
+"""
+Python file for converting lots of images to ASCII characters in one go.
+"""
+
+from contextlib import redirect_stdout
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from img2ascii import IMG2ASCIIConverter
+from helper import bcolors
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp", ".gif", ".pgm", ".ppm")
+MANIFEST_FILE_NAME = "img2ascii_manifest.json"
+
+# Converter of each worker process, made once in `_init_batch_worker` and reused for every image
+_batch_converter = None
+_batch_settings = None
+
+
+def collect_image_paths(sources):
+    """
+    Returns the image paths given by `sources`, each of which can be an image, a folder of images,
+    a glob pattern, or "-" to read one path per line from stdin.
+    """
+    image_paths = []
+
+    for source in sources:
+        if source == "-":
+            image_paths += [line.strip() for line in sys.stdin if line.strip() != ""]
+        elif os.path.isdir(source):
+            image_paths += sorted(os.path.join(source, name) for name in os.listdir(source)
+                                  if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+        elif os.path.exists(source):
+            image_paths.append(source)
+        else:
+            image_paths += sorted(glob.glob(source, recursive=True))
+
+    return image_paths
+
+
+def hash_file(file_path: str):
+    """
+    Returns the BLAKE2 hash of the contents of a file.
+    """
+    file_hash = hashlib.blake2b()
+
+    with open(file_path, mode='rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def _output_paths(image_path: str, output_folder: str, text_only: bool):
+    """
+    Returns the output text path and image path (None if text only) of an image.
+    """
+    root, ext = os.path.splitext(image_path)
+
+    if output_folder != "":
+        root = os.path.join(output_folder, os.path.basename(root))
+
+    return root + "_ascii.txt", None if text_only else root + "_ascii" + ext
+
+
+def _init_batch_worker(settings: dict):
+    """
+    Makes the converter that a worker process uses for every image it gets.
+    """
+    global _batch_converter, _batch_settings
+
+    _batch_settings = settings
+    _batch_converter = IMG2ASCIIConverter()
+    _batch_converter.set_ascii_chars_count(settings["horizontal_ascii_chars_count"], settings["vertical_ascii_chars_count"])
+    _batch_converter.set_render_backend(settings["render_backend"])
+
+
+def _convert_image_task(task: tuple):
+    """
+    Converts one image with the converter of the worker, returns (image path, True if it worked, seconds taken).
+    """
+    image_path, text_path, image_output_path = task
+    converter = _batch_converter
+
+    t0 = time.perf_counter()
+
+    # Every step prints what it is doing, which is a bit much for thousands of images
+    with open(os.devnull, mode='w') as devnull, redirect_stdout(devnull):
+        try:
+            converted = converter.set_image(image_path) and converter.scale_image() is not None
+            converted = converted and converter.create_text(gscale_level=_batch_settings["gscale_level"]) != ""
+            converted = converted and converter.write_to_text_file(text_path)
+
+            if converted and image_output_path is not None:
+                converted = converter.create_image() and converter.write_to_image_file(image_output_path)
+        except Exception:
+            converted = False
+
+    return image_path, bool(converted), time.perf_counter() - t0
+
+
+def convert_images(image_paths, output_folder: str="", workers: int=0, horizontal: int=200, vertical: int=200,
+                   gscale_level: int=0, render_backend: str="cairo", text_only: bool=False, manifest_path: str=""):
+    """
+    Converts every image in `image_paths` to ASCII text and image files, spread over `workers` processes
+    (default number of CPUs) that each keep one converter for all their images.
+
+    Images whose contents and settings are the same as in the manifest of the last run, and whose outputs
+    are still there, are skipped. The manifest is kept in the output folder (or the current folder).
+    Images from different folders that would be written to the same output files fail without being converted.
+
+    Returns a list of (image path, "converted" / "skipped" / "failed", seconds taken).
+    """
+    workers = workers if workers > 0 else os.cpu_count()
+    settings = {
+        "horizontal_ascii_chars_count": horizontal,
+        "vertical_ascii_chars_count": vertical,
+        "gscale_level": gscale_level,
+        "render_backend": render_backend,
+        "text_only": text_only,
+    }
+
+    if output_folder != "":
+        os.makedirs(output_folder, exist_ok=True)
+
+    manifest_path = manifest_path if manifest_path != "" else os.path.join(output_folder, MANIFEST_FILE_NAME)
+    manifest = {}
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    # The same image given twice (e.g. by a folder and a glob) is only converted once
+    unique_image_paths = {}
+
+    for image_path in image_paths:
+        unique_image_paths.setdefault(os.path.abspath(image_path), image_path)
+
+    image_paths = list(unique_image_paths.values())
+
+    # Images with the same name from different folders would write the same outputs, so none of them is converted
+    images_by_output = {}
+
+    for image_path in image_paths:
+        images_by_output.setdefault(_output_paths(image_path, output_folder, text_only)[0], []).append(image_path)
+
+    clashing_paths = set()
+
+    for text_path, output_images in images_by_output.items():
+        if len(output_images) > 1:
+            print(f"{bcolors.WARNING}[-] {', '.join(output_images)} would all be written to '{text_path}', skipping them, rename them or convert them separately 0.o {bcolors.ENDC}")
+            clashing_paths.update(output_images)
+
+    # Work out what actually needs converting
+    results = []
+    tasks = []
+    file_hashes = {}
+
+    for image_path in image_paths:
+        if not os.path.exists(image_path):
+            print(f"{bcolors.WARNING}[-] Image file of path '{image_path}' does not exist 0.o {bcolors.ENDC}")
+            results.append((image_path, "failed", 0.0))
+            continue
+
+        if image_path in clashing_paths:
+            results.append((image_path, "failed", 0.0))
+            continue
+
+        file_hashes[image_path] = hash_file(image_path)
+        entry = manifest.get(os.path.abspath(image_path))
+
+        if (entry is not None and entry["hash"] == file_hashes[image_path] and entry["settings"] == settings
+                and all(os.path.exists(path) for path in entry["outputs"])):
+            results.append((image_path, "skipped", 0.0))
+        else:
+            tasks.append((image_path, *_output_paths(image_path, output_folder, text_only)))
+
+    print(f"{bcolors.WARNING}[!] Converting {len(tasks)} image(s), skipping {sum(result[1] == 'skipped' for result in results)} unchanged one(s), with {workers} worker(s) {bcolors.ENDC}\n")
+
+    t0 = time.time()
+
+    try:
+        if len(tasks) == 0:
+            return results
+
+        with multiprocessing.Pool(workers, initializer=_init_batch_worker, initargs=(settings,)) as pool:
+            for image_path, converted, seconds in pool.imap_unordered(_convert_image_task, tasks, chunksize=4):
+                if converted:
+                    manifest[os.path.abspath(image_path)] = {
+                        "hash": file_hashes[image_path],
+                        "settings": settings,
+                        "outputs": [path for path in _output_paths(image_path, output_folder, text_only) if path is not None],
+                    }
+                    print(f"{bcolors.OKGREEN}[+] {image_path} took {seconds:.3f}s{bcolors.ENDC}")
+                else:
+                    print(f"{bcolors.FAIL}[-] {image_path} failed after {seconds:.3f}s{bcolors.ENDC}")
+
+                results.append((image_path, "converted" if converted else "failed", seconds))
+    finally:
+        # Save whatever got done, even if the run was stopped halfway
+        with open(manifest_path, mode='w') as f:
+            json.dump(manifest, f, indent=2)
+
+    converted_count = sum(result[1] == "converted" for result in results)
+    print(f"\n{bcolors.WARNING}[+] Converted {converted_count} image(s) in {time.time() - t0:.2f}s ·w· {bcolors.ENDC}\n")
+
+    return results
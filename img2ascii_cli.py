@@ -1,4 +1,5 @@
 from argparse import ArgumentParser
+import shutil
 
 if __name__ == '__main__':
     # Read arguments
@@ -8,37 +9,187 @@ if __name__ == '__main__':
     parser.add_argument("-v", "--video", help="Path to video file")
     parser.add_argument("-cs", "--compression-speed", default=2, type=int, help="Compression speed when making video, a lower number means slower processing but higher compression.\nNumber ranges from 0-9")
     
+    parser.add_argument("-t", "--threads", default=0, type=int, help="Number of converter threads to run in a decode / convert / encode pipeline, 0 converts one frame at a time")
+
+    parser.add_argument("-w", "--workers", default=0, type=int, help="Number of processes to convert frames in, takes priority over threads")
+
+    parser.add_argument("-s", "--segments", default=0, type=int, help="Split the video into this many segments that are converted in separate processes and joined at the end, finished segments are kept if a run fails")
+
+    parser.add_argument("-fc", "--frame-cache", default=0, type=int, help="Number of rendered frames to remember, so repeated frames aren't rendered again, 0 turns it off")
+    parser.add_argument("-ft", "--frame-cache-tolerance", default=0, type=int, help="Reuse the last rendered frame if fewer than this many characters changed, needs --frame-cache")
+
+    # Accepts output fps and part of the video to convert
+    parser.add_argument("-fps", "--output-fps", default=0, type=float, help="Only convert enough frames for this many frames a second, 0 keeps every frame")
+    parser.add_argument("-st", "--start", default=0, type=float, help="Second of the video to start converting from")
+    parser.add_argument("-et", "--end", default=-1, type=float, help="Second of the video to stop converting at, -1 is the end")
+
+    # Accepts GIF palette
+    parser.add_argument("-gp", "--gif-palette", default="gray", choices=["gray", "mono"], help="(GIF) Palette of GIF frames, mono is only black and white and makes smaller files")
+
+    # Accepts how much the writer can hold
+    parser.add_argument("-wb", "--writer-buffer", default=0, type=float, help="Most megabytes of converted frames that can wait to be encoded, 0 just keeps it to 8 frames")
+
+    # Accepts incremental rendering
+    parser.add_argument("-inc", "--incremental", action="store_true", help="Only redraw the characters that changed since the last frame")
+
+    parser.add_argument("-p", "--play", action="store_true", help="Play the video as ASCII in the terminal instead of making a video file")
+
+    parser.add_argument("-a", "--archive", action="store_true", help="Save the frames as ASCII characters to a .a2v archive instead of making a video, give the archive to -v to render it later")
+
     # Accepts image file path
     parser.add_argument("-i", "--image", help="Path to image file")
 
+    # Only write the ASCII text, which doesn't need Cairo at all
+    parser.add_argument("-to", "--text-only", action="store_true", help="(Image / Batch) Only write the ASCII text file, not the image")
+
+    # Reads the image in strips for images too big to load at once
+    parser.add_argument("-tl", "--tiled", action="store_true", help="(Image) Read the image in strips and write the ASCII image in bands, for images too big to load at once")
+
+    # Colours the characters, with a palette for the terminal
+    parser.add_argument("-col", "--colour", nargs="?", const="truecolor", choices=["truecolor", "256"], help="Colour every character with the colour of its part of the image, 256 uses the 256 colour palette when playing in the terminal")
+
+    # Times every stage of the conversion
+    parser.add_argument("-pr", "--profile", nargs="?", const="", help="Print how long every stage took, and write the stats to PROFILE if given (.json or .csv)")
+    parser.add_argument("-pm", "--profile-memory", action="store_true", help="With --profile, also record how much memory every stage allocates, which is slower")
+
+    # Picks characters by shape too
+    parser.add_argument("-sm", "--shape-matching", action="store_true", help="Pick every character by its shape as well as its brightness, looks about as sharp with half the characters")
+
+    # Accepts render backend
+    parser.add_argument("-r", "--renderer", default="cairo", choices=["cairo", "atlas"], help="How to draw the ASCII characters, atlas is faster for video")
+
+    # Accepts images, folders or glob patterns to convert in one go, "-" reads paths from stdin
+    parser.add_argument("-b", "--batch", nargs="+", help="Images, folders of images or glob patterns to convert in one go, - to read paths from stdin")
+    parser.add_argument("-o", "--output-folder", default="", help="(Batch) Folder to write outputs to, default is next to each image")
+
+    # Accepts port to serve conversions on
+    parser.add_argument("-sv", "--serve", nargs="?", const=8000, type=int, help="Convert images sent to http://127.0.0.1:SERVE/convert, keeping converters warm between requests, --threads sets how many")
+
     # Main statements
     args = parser.parse_args()
 
-    from vid2ascii import VID2ASCIIConverter
-    from img2ascii import IMG2ASCIIConverter
+    # Converters are imported in the branch that uses them, so image runs don't wait for
+    # the video modules and text only runs don't wait for Cairo
     from helper import bcolors
 
+    profiler = None
+
+    if args.profile is not None:
+        from profiler import StageProfiler
+        profiler = StageProfiler(trace_allocations=args.profile_memory)
+
     if args.video and args.image:
         print(f"{bcolors.WARNING}Cannot have both image and video :({bcolors.ENDC}\n")
 
+    # If playing video in terminal, fit it to the terminal
+    elif args.video and args.play:
+        from vid2ascii import VID2ASCIIConverter
+
+        converter = VID2ASCIIConverter()
+        converter.set_profiler(profiler)
+        converter.set_video(args.video)
+        converter.set_output_fps(args.output_fps)
+        converter.set_time_range(args.start, args.end)
+        terminal_size = shutil.get_terminal_size()
+        converter.init_image_to_ascii_converter(terminal_size.columns, terminal_size.lines - 1)
+        converter.set_shape_matching(args.shape_matching)
+        if args.colour:
+            converter.set_colour(palette=args.colour)
+        converter.play_in_terminal()
+
+    # If saving video to archive
+    elif args.video and args.archive:
+        from vid2ascii import VID2ASCIIConverter
+
+        converter = VID2ASCIIConverter()
+        converter.set_profiler(profiler)
+        converter.set_video(args.video)
+        converter.set_output_fps(args.output_fps)
+        converter.set_time_range(args.start, args.end)
+        converter.init_image_to_ascii_converter(200, 200)
+        converter.create_archive()
+
+    # If rendering archive
+    elif args.video and args.video.lower().endswith(".a2v"):
+        from vid2ascii import VID2ASCIIConverter
+
+        converter = VID2ASCIIConverter()
+        converter.set_profiler(profiler)
+        converter.init_image_to_ascii_converter(200, 200)
+        converter.set_render_backend(args.renderer)
+        converter.set_incremental_render(args.incremental)
+        converter.set_writer_buffer(max_bytes=int(args.writer_buffer * 1024 * 1024))
+        speeds = ["placebo", "veryslow", "slower", "slow", "medium", "fast", "faster", "veryfast", "superfast", "ultrafast"]
+        converter.render_archive(args.video, compression_speed=speeds[args.compression_speed])
+
     # If video
     elif args.video:
+        from vid2ascii import VID2ASCIIConverter
+
         converter = VID2ASCIIConverter()
+        converter.set_profiler(profiler)
         converter.set_video(args.video)
+        converter.set_output_fps(args.output_fps)
+        converter.set_time_range(args.start, args.end)
         converter.init_image_to_ascii_converter(200, 200)
+        converter.set_render_backend(args.renderer)
+        converter.set_frame_cache(args.frame_cache, args.frame_cache_tolerance)
+        converter.set_incremental_render(args.incremental)
+        converter.set_writer_buffer(max_bytes=int(args.writer_buffer * 1024 * 1024))
+        converter.set_gif_output(palette=args.gif_palette)
+        converter.set_shape_matching(args.shape_matching)
+        if args.colour:
+            converter.set_colour(palette=args.colour)
         speeds = ["placebo", "veryslow", "slower", "slow", "medium", "fast", "faster", "veryfast", "superfast", "ultrafast"]
-        converter.create_video(compression_speed=speeds[args.compression_speed])
+        if args.segments > 0:
+            converter.create_video_segmented(compression_speed=speeds[args.compression_speed], segments=args.segments, workers=args.workers)
+        else:
+            converter.create_video(compression_speed=speeds[args.compression_speed], threads=args.threads, workers=args.workers)
 
     # If audio
     elif args.image:
+        if args.tiled:
+            from img2ascii_tiled import TiledIMG2ASCIIConverter as IMG2ASCIIConverter
+        else:
+            from img2ascii import IMG2ASCIIConverter
+
         converter = IMG2ASCIIConverter()
-        converter.set_image(args.image)
+        converter.set_profiler(profiler)
         converter.set_ascii_chars_count(200, 200)
+        converter.set_shape_matching(args.shape_matching)
+        if args.colour:
+            converter.set_colour(palette=args.colour)
+        converter.set_image(args.image)
+        converter.set_render_backend(args.renderer)
         converter.scale_image()
         converter.create_text()
-        converter.create_image()
         converter.write_to_text_file()
-        converter.write_to_image_file()
+
+        if args.colour:
+            converter.write_to_ansi_file()
+
+        if not args.text_only:
+            converter.create_image()
+            converter.write_to_image_file()
+
+    # If batch of images
+    elif args.batch:
+        from img2ascii_batch import collect_image_paths, convert_images
+        convert_images(collect_image_paths(args.batch), output_folder=args.output_folder, workers=args.workers, render_backend=args.renderer, text_only=args.text_only)
+
+    # If serving
+    elif args.serve is not None:
+        from img2ascii_server import serve
+        serve(port=args.serve, converters=args.threads if args.threads > 0 else 4, render_backend=args.renderer)
 
     else:
-        print("Nothing happened")
\ No newline at end of file
+        print("Nothing happened")
+
+    if profiler is not None:
+        profiler.print_stats()
+
+        if args.profile != "":
+            profiler.write(args.profile)
+            print(f"{bcolors.WARNING}[+] Profile written to {args.profile} ·w· {bcolors.ENDC}\n")
+
+        profiler.close()
\ No newline at end of file
@@ -0,0 +1,446 @@
+"""
+Python file for a local HTTP server that converts images to ASCII characters, keeping a pool of converters
+warm between requests so callers don't pay for starting Python and setting up Cairo every time.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import json
+import numpy as np
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from img2ascii import IMG2ASCIIConverter
+from helper import bcolors
+
+
+OUTPUT_FORMATS = ("text", "ansi", "png")
+CONTENT_TYPES = {"text": "text/plain; charset=utf-8", "ansi": "text/plain; charset=utf-8", "png": "image/png", "json": "application/json"}
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Image sizes whose layouts are worked out when the server starts, at every warm character count
+WARM_IMAGE_SIZES = ((1280, 720), (1920, 1080), (1024, 768), (1080, 1080))
+
+
+class IMG2ASCIIServer:
+    """
+    An asyncio HTTP server, on 127.0.0.1 by default, that converts images sent as request bodies.
+
+    POST /convert?columns=200&gscale=0&format=text|ansi|png&colour=0|1&shape=0|1 with the image file as the body
+    returns the ASCII text (ANSI coloured text for "ansi") or the ASCII image as a PNG.
+    GET /metrics returns the request count, latencies and queue depth as JSON, and GET /health returns "ok".
+
+    Requests that are waiting when a converter frees up are taken together, and the ones with the same options
+    are converted as one batch on one converter, with identical images in a batch only converted once.
+    """
+
+    def __init__(self, host: str="127.0.0.1", port: int=8000, converters: int=4, render_backend: str="cairo",
+                 warm_columns=(100, 200), max_batch_size: int=16, max_body_bytes: int=64 * 1024 * 1024, latency_window: int=1000) -> None:
+        self.host = host
+        self.port = port
+        self.render_backend = render_backend
+        self.warm_columns = warm_columns
+        self.max_batch_size = max_batch_size
+        self.max_body_bytes = max_body_bytes
+
+        self.converter_count = max(1, converters)
+        self.idle_converters = None  # asyncio.Queue of converters, made in `start` so it belongs to the running loop
+        self.pending_requests = None  # asyncio.Queue of (options, body, future, time queued)
+        self.executor = ThreadPoolExecutor(max_workers=self.converter_count)
+        self.server = None
+        self.dispatcher = None
+
+        # Metrics, latencies are kept for the last `latency_window` requests
+        self.request_count = 0
+        self.error_count = 0
+        self.batch_count = 0
+        self.batched_request_count = 0
+        self.coalesced_request_count = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.queue_waits = deque(maxlen=latency_window)
+        self.started_time = None
+
+    def _create_converter(self):
+        """
+        Creates a converter with the layouts of `WARM_IMAGE_SIZES` at every warm character count already worked out,
+        shouldn't be called outside class.
+        """
+        converter = IMG2ASCIIConverter()
+        converter.set_render_backend(self.render_backend)
+
+        for columns in self.warm_columns:
+            converter.set_ascii_chars_count(columns, columns)
+
+            for width, height in WARM_IMAGE_SIZES:
+                converter.set_image_by_array(np.zeros((height, width), dtype=np.uint8))
+                converter.scale_image()
+                converter.create_text()
+                converter.prepare_layout(*converter.image_ascii_indices.shape[::-1])
+
+        return converter
+
+    async def start(self):
+        """
+        Warms up the converters and starts listening, returns once the server is accepting connections.
+        With port 0 a free port is picked, which is then in `self.port`.
+        """
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+
+        converters = await asyncio.gather(*[loop.run_in_executor(self.executor, self._create_converter) for _ in range(self.converter_count)])
+
+        self.idle_converters = asyncio.Queue()
+        self.pending_requests = asyncio.Queue()
+
+        for converter in converters:
+            self.idle_converters.put_nowait(converter)
+
+        self.dispatcher = asyncio.create_task(self._dispatch())
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started_time = time.time()
+
+        print(f"{bcolors.WARNING}[+] Warmed up {self.converter_count} converter(s) in {time.perf_counter() - t0:.2f}s, listening on http://{self.host}:{self.port} ·w· {bcolors.ENDC}\n")
+
+    async def serve_forever(self):
+        """
+        Starts the server and handles requests until cancelled.
+        """
+        await self.start()
+
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops accepting connections, stops the dispatcher and shuts down the converter threads.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            self.dispatcher = None
+
+        self.executor.shutdown(wait=False)
+
+    async def convert(self, options: dict, body: bytes):
+        """
+        Queues an image to be converted with `options` (see `parse_options`), and returns the output bytes once it is done.
+
+        Raises ValueError if the body is empty or the image can't be read.
+        """
+        if not body:
+            raise ValueError("Request body is empty, send the image file as the body")
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending_requests.put_nowait((options, body, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self.pending_requests.qsize())
+
+        return await future
+
+    async def _dispatch(self):
+        """
+        Waits for a request and a free converter, then takes every request waiting by then (up to `max_batch_size`)
+        and hands them to converters as one batch per set of options, shouldn't be called outside class.
+        """
+        while True:
+            batch = [await self.pending_requests.get()]
+            converter = await self.idle_converters.get()
+
+            while len(batch) < self.max_batch_size and not self.pending_requests.empty():
+                batch.append(self.pending_requests.get_nowait())
+
+            groups = {}
+
+            for request in batch:
+                groups.setdefault(tuple(sorted(request[0].items())), []).append(request)
+
+            for requests in groups.values():
+                if converter is None:
+                    converter = await self.idle_converters.get()
+
+                asyncio.create_task(self._run_batch(converter, requests))
+                converter = None
+
+            if converter is not None:
+                self.idle_converters.put_nowait(converter)
+
+    async def _run_batch(self, converter, requests):
+        """
+        Converts a batch of requests with the same options on a converter thread,
+        then gives the converter back and answers every request, shouldn't be called outside class.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.batch_count += 1
+        self.batched_request_count += len(requests)
+        self.in_flight += len(requests)
+
+        for request in requests:
+            self.queue_waits.append(started - request[3])
+
+        try:
+            bodies = [request[1] for request in requests]
+            results = await loop.run_in_executor(self.executor, self._convert_batch, converter, requests[0][0], bodies)
+
+            # The same image sent more than once in a batch was only converted once
+            self.coalesced_request_count += len(bodies) - len(set(bodies))
+        except Exception as e:
+            results = [e] * len(requests)
+        finally:
+            self.idle_converters.put_nowait(converter)
+            self.in_flight -= len(requests)
+
+        for request, result in zip(requests, results):
+            if request[2].done():
+                continue
+            if isinstance(result, Exception):
+                request[2].set_exception(result)
+            else:
+                request[2].set_result(result)
+
+    def _convert_batch(self, converter, options: dict, bodies):
+        """
+        Converts every image of a batch with the same options on one converter, runs in a converter thread.
+
+        Returns the output bytes (or the exception raised) of every image, shouldn't be called outside class.
+        """
+        converter.set_ascii_chars_count(options["columns"], options["columns"])
+        converter.set_colour(options["colour"] or options["format"] == "ansi")
+        converter.set_shape_matching(options["shape"])
+
+        outputs = {}
+        results = []
+
+        for body in bodies:
+            # The same image sent more than once at the same time is only converted once
+            if body in outputs:
+                results.append(outputs[body])
+                continue
+
+            try:
+                outputs[body] = self._convert_image(converter, options, body)
+            except Exception as e:
+                outputs[body] = e
+
+            results.append(outputs[body])
+
+        return results
+
+    @staticmethod
+    def _convert_image(converter, options: dict, body: bytes):
+        """
+        Converts one image file given as bytes to the output format of `options`, shouldn't be called outside class.
+        """
+        try:
+            image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR if converter.colour else cv2.IMREAD_GRAYSCALE)
+        except cv2.error:
+            image = None
+
+        if image is None:
+            raise ValueError("Request body isn't an image that can be read")
+
+        converter.set_image_by_array(image)
+        converter.scale_image()
+        text = converter.create_text(gscale_level=options["gscale"])
+
+        if options["format"] == "text":
+            return text.encode("utf-8")
+
+        if options["format"] == "ansi":
+            return converter.create_ansi_text().encode("utf-8")
+
+        converter.create_image()
+        ok, png = cv2.imencode(".png", converter.ascii_image_array)
+
+        if not ok:
+            raise RuntimeError("Couldn't encode the ASCII image as PNG")
+
+        return png.tobytes()
+
+    def get_metrics(self):
+        """
+        Returns the request counts, batch sizes, queue depth and latencies (in milliseconds, over the last requests) as a dict.
+        """
+        def percentiles(samples):
+            if not samples:
+                return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+
+            samples = np.array(samples) * 1000
+            return {"p50": float(np.percentile(samples, 50)), "p95": float(np.percentile(samples, 95)), "max": float(samples.max())}
+
+        return {
+            "uptime_seconds": time.time() - self.started_time if self.started_time is not None else 0.0,
+            "requests": self.request_count,
+            "errors": self.error_count,
+            "batches": self.batch_count,
+            "mean_batch_size": self.batched_request_count / self.batch_count if self.batch_count > 0 else 0.0,
+            "coalesced_requests": self.coalesced_request_count,
+            "queue_depth": self.pending_requests.qsize() if self.pending_requests is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "idle_converters": self.idle_converters.qsize() if self.idle_converters is not None else 0,
+            "converters": self.converter_count,
+            "latency_ms": percentiles(self.latencies),
+            "queue_wait_ms": percentiles(self.queue_waits),
+        }
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Reads HTTP/1.1 requests off a connection and answers them, keeping it open unless asked not to,
+        shouldn't be called outside class.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line.strip():
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, "text", b"Request line has to be METHOD TARGET VERSION\n", False)
+                    break
+
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if line.strip() == b"":
+                        break
+
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    content_length = int(headers.get("content-length", 0))
+                except ValueError:
+                    content_length = -1
+
+                if content_length < 0:
+                    await self._respond(writer, 400, "text", b"Content-Length has to be a whole number of bytes\n", False)
+                    break
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                if content_length > self.max_body_bytes:
+                    await self._respond(writer, 413, "text", f"Images can be at most {self.max_body_bytes} bytes\n".encode(), False)
+                    break
+
+                body = await reader.readexactly(content_length) if content_length > 0 else b""
+                status, output_format, content = await self._route(method, target, body)
+                await self._respond(writer, status, output_format, content, keep_alive)
+
+                if not keep_alive:
+                    break
+
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, body: bytes):
+        """
+        Answers one request, returns (status, output format, content), shouldn't be called outside class.
+        """
+        url = urlsplit(target)
+
+        if url.path == "/health":
+            return 200, "text", b"ok\n"
+
+        if url.path == "/metrics":
+            return 200, "json", json.dumps(self.get_metrics(), indent=2).encode()
+
+        if url.path != "/convert":
+            return 404, "text", b"Try POST /convert, GET /metrics or GET /health\n"
+
+        if method != "POST":
+            return 405, "text", b"Send the image to /convert with POST\n"
+
+        t0 = time.perf_counter()
+        self.request_count += 1
+
+        try:
+            options = parse_options(url.query)
+            content = await self.convert(options, body)
+            status, output_format = 200, options["format"]
+        except ValueError as e:
+            status, output_format, content = 400, "text", f"{e}\n".encode()
+        except Exception as e:
+            status, output_format, content = 500, "text", f"{type(e).__name__}: {e}\n".encode()
+
+        if status != 200:
+            self.error_count += 1
+
+        self.latencies.append(time.perf_counter() - t0)
+
+        return status, output_format, content
+
+    @staticmethod
+    async def _respond(writer, status: int, output_format: str, content: bytes, keep_alive: bool):
+        """
+        Writes an HTTP response, shouldn't be called outside class.
+        """
+        head = (f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+                f"Content-Type: {CONTENT_TYPES[output_format]}\r\n"
+                f"Content-Length: {len(content)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+
+        writer.write(head.encode("latin-1") + content)
+        await writer.drain()
+
+
+def parse_options(query: str):
+    """
+    Returns the conversion options of a /convert query string as a dict, filling in the defaults.
+
+    Raises ValueError if any of them is wrong.
+    """
+    values = {name: value[-1] for name, value in parse_qs(query).items()}
+
+    try:
+        options = {
+            "columns": int(values.get("columns", 200)),
+            "gscale": int(values.get("gscale", 0)),
+            "format": values.get("format", "text").lower(),
+            "colour": values.get("colour", "0").lower() in ("1", "true", "yes"),
+            "shape": values.get("shape", "0").lower() in ("1", "true", "yes"),
+        }
+    except ValueError:
+        raise ValueError("columns and gscale have to be whole numbers")
+
+    if not 1 <= options["columns"] <= 2000:
+        raise ValueError("columns has to be between 1 and 2000")
+
+    if options["format"] not in OUTPUT_FORMATS:
+        raise ValueError(f"format has to be one of {', '.join(OUTPUT_FORMATS)}")
+
+    return options
+
+
+def serve(host: str="127.0.0.1", port: int=8000, converters: int=4, render_backend: str="cairo"):
+    """
+    Runs the server until interrupted.
+    """
+    server = IMG2ASCIIServer(host, port, converters, render_backend)
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print(f"\n{bcolors.WARNING}[!] Server stopped after {server.request_count} request(s) (¬‿¬) {bcolors.ENDC}\n")
+
+
+if __name__ == "__main__":
+    serve()
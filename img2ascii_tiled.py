@@ -0,0 +1,477 @@
+"""
+Python file for converting images too big to load at once (scans, maps, gigapixel panoramas) to ASCII characters,
+reading the image a strip at a time and writing the ASCII image out a band of rows at a time.
+"""
+
+import cv2
+import numpy as np
+import os
+import struct
+import time
+import zlib
+
+from img2ascii import GlyphAtlas, IMG2ASCIIConverter
+from helper import bcolors
+
+
+NETPBM_EXTENSIONS = (".pgm", ".ppm", ".pnm")
+
+
+class ArrayStripReader:
+    """
+    Reads strips of rows out of an image array as 8 bit grayscale, the array can be a memory map
+    so only the rows asked for are ever read from disk.
+    """
+
+    def __init__(self, image_array, channel_order: str="bgr", max_value: int=255) -> None:
+        """
+        @param channel_order: Order of the channels of colour images, "bgr" like cv2 or "rgb" like netpbm.
+        @param max_value: Value of white, for images that aren't 8 bit.
+        """
+        if image_array.ndim not in (2, 3) or (image_array.ndim == 3 and image_array.shape[2] not in (3, 4)):
+            raise ValueError(f"Image of shape {image_array.shape} is not grayscale, BGR or BGRA")
+
+        self.image_array = image_array
+        self.height, self.width = image_array.shape[:2]
+        self.channel_order = channel_order
+        self.max_value = max_value
+
+    def read_rows(self, start: int, end: int):
+        """
+        Returns rows `start` to `end` as a (rows, width) uint8 array.
+        """
+        strip = np.asarray(self.image_array[start:end])
+
+        if strip.dtype != np.uint8 or self.max_value != 255:
+            strip = (strip.astype(np.uint32) * 255 // self.max_value).astype(np.uint8)
+
+        if strip.ndim == 3:
+            if strip.shape[2] == 4:
+                codes = cv2.COLOR_BGRA2GRAY if self.channel_order == "bgr" else cv2.COLOR_RGBA2GRAY
+            else:
+                codes = cv2.COLOR_BGR2GRAY if self.channel_order == "bgr" else cv2.COLOR_RGB2GRAY
+            strip = cv2.cvtColor(np.ascontiguousarray(strip), codes)
+
+        return strip
+
+
+def open_netpbm(image_path: str):
+    """
+    Returns an `ArrayStripReader` over a memory map of a binary PGM (P5) or PPM (P6) file.
+    """
+    with open(image_path, mode='rb') as f:
+        magic = f.read(2)
+
+        if magic not in (b"P5", b"P6"):
+            raise ValueError(f"'{image_path}' is not a binary PGM or PPM file")
+
+        # Width, height and max value, separated by whitespace with comments allowed in between
+        fields = []
+        token = b""
+
+        while len(fields) < 3:
+            char = f.read(1)
+
+            if char == b"#":
+                f.readline()
+            elif char.isspace() or char == b"":
+                if token != b"":
+                    fields.append(int(token))
+                    token = b""
+                if char == b"":
+                    raise ValueError(f"Header of '{image_path}' ends too early")
+            else:
+                token += char
+
+        # Exactly one whitespace character comes after the max value, which was read above
+        offset = f.tell()
+
+    width, height, max_value = fields
+    channels = 3 if magic == b"P6" else 1
+    dtype = np.uint8 if max_value < 256 else np.dtype(">u2")
+    shape = (height, width, channels) if channels == 3 else (height, width)
+
+    image_array = np.memmap(image_path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    return ArrayStripReader(image_array, channel_order="rgb", max_value=max_value)
+
+
+def read_jpeg_size(image_path: str):
+    """
+    Returns (width, height) of a JPEG file from its frame header, without decoding the image.
+
+    Raises ValueError if the file isn't a JPEG.
+    """
+    with open(image_path, mode='rb') as f:
+        if f.read(2) != b"\xff\xd8":
+            raise ValueError(f"'{image_path}' is not a JPEG file")
+
+        while True:
+            byte = f.read(1)
+
+            if byte == b"":
+                raise ValueError(f"'{image_path}' has no JPEG frame header")
+
+            if byte != b"\xff":
+                continue
+
+            # Markers can be padded with any number of 0xFF bytes
+            marker = f.read(1)
+
+            while marker == b"\xff":
+                marker = f.read(1)
+
+            marker = marker[0] if marker != b"" else 0
+
+            # Markers without a length
+            if marker in (0x00, 0x01) or 0xd0 <= marker <= 0xd7:
+                continue
+
+            length = struct.unpack(">H", f.read(2))[0]
+
+            # Start of frame markers, 0xc4, 0xc8 and 0xcc are other tables using the same range
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                _, height, width = struct.unpack(">BHH", f.read(5))
+                return width, height
+
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def open_reduced(image_path: str, columns: int, rows: int):
+    """
+    Returns an `ArrayStripReader` over a JPEG decoded at 1/8, 1/4 or 1/2 size, whichever is the smallest that
+    still has at least two pixels for every character of a `columns` x `rows` grid (which would fit the full image).
+
+    The size is picked from the JPEG header, so the image is decoded once and never at full size unless it has to be.
+    Other formats would be decoded whole by cv2 first, so they raise ValueError instead.
+    """
+    width, height = read_jpeg_size(image_path)
+
+    # cv2 refuses images with more pixels than this, even when decoding them at a reduced size
+    max_pixels = int(os.environ.get("OPENCV_IO_MAX_IMAGE_PIXELS", 1 << 30))
+
+    if width * height > max_pixels:
+        raise ValueError(f"{width}x{height} is more pixels than cv2 reads, raise OPENCV_IO_MAX_IMAGE_PIXELS or convert it to PGM / PPM")
+
+    flag = cv2.IMREAD_GRAYSCALE
+
+    for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4), (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+        reduced_width, reduced_height = -(-width // factor), -(-height // factor)
+
+        # Cells of the grid in the reduced image, the grid keeps the aspect ratio so the fit is the same at any size
+        scale_ratio = min(columns / (reduced_width * 5 / 2), rows / reduced_height)
+
+        if scale_ratio <= 0.5:
+            flag = reduced_flag
+            break
+
+    image_array = cv2.imread(image_path, flag)
+    return None if image_array is None else ArrayStripReader(image_array)
+
+
+class StreamingPNGWriter:
+    """
+    Writes an 8 bit grayscale PNG a few rows at a time, compressing as it goes,
+    so the whole image never has to be in memory.
+    """
+
+    # Compressed data is written in IDAT chunks of about this many bytes
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, image_path: str, width: int, height: int, compression_level: int=6) -> None:
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+
+        self.compressor = zlib.compressobj(compression_level)
+        self.pending = []
+        self.pending_size = 0
+
+        self.file = open(image_path, mode='wb')
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes):
+        """
+        Writes one PNG chunk, shouldn't be called outside class.
+        """
+        self.file.write(struct.pack(">I", len(data)) + chunk_type + data)
+        self.file.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+    def _flush_pending(self):
+        """
+        Writes the compressed data so far as an IDAT chunk, shouldn't be called outside class.
+        """
+        if self.pending_size > 0:
+            self._write_chunk(b"IDAT", b"".join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write_rows(self, rows):
+        """
+        Writes the next rows of the image, a (rows, width) uint8 array.
+        """
+        if rows.ndim != 2 or rows.shape[1] != self.width:
+            raise ValueError(f"Rows of shape {rows.shape} given to PNG of width {self.width}")
+
+        if self.rows_written + rows.shape[0] > self.height:
+            raise ValueError(f"More than {self.height} rows given to PNG of height {self.height}")
+
+        # Every row starts with its filter type, 0 is no filter
+        scanlines = np.zeros((rows.shape[0], self.width + 1), dtype=np.uint8)
+        scanlines[:, 1:] = rows
+
+        data = self.compressor.compress(scanlines.data)
+        self.rows_written += rows.shape[0]
+
+        if data != b"":
+            self.pending.append(data)
+            self.pending_size += len(data)
+
+        if self.pending_size >= self.CHUNK_SIZE:
+            self._flush_pending()
+
+    def close(self):
+        """
+        Finishes the compressed data and the file.
+        """
+        if self.file.closed:
+            return
+
+        if self.rows_written != self.height:
+            self.abort()
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows written to {self.image_path}")
+
+        self.pending.append(self.compressor.flush())
+        self.pending_size += len(self.pending[-1])
+        self._flush_pending()
+        self._write_chunk(b"IEND", b"")
+        self.file.close()
+
+    def abort(self):
+        """
+        Closes the file without finishing it and removes it, so a PNG that was cut off halfway isn't left behind.
+        Does nothing once the file is closed.
+        """
+        if self.file.closed:
+            return
+
+        self.file.close()
+
+        if os.path.exists(self.image_path):
+            os.remove(self.image_path)
+
+
+class TiledIMG2ASCIIConverter(IMG2ASCIIConverter):
+    """
+    Image to ASCII converter for images too big to load at once.
+
+    `set_image` only opens the image, `scale_image` reads it a strip of rows at a time and averages every cell
+    of the character grid, and `write_to_image_file` renders the ASCII image a band of rows at a time straight
+    into a PNG file. Memory used depends on the width of the image and the size of the grid, not the whole image.
+
+    The ASCII image is written at the size it is rendered at, and not scaled back to the size of the original.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.strip_reader = None
+
+        # Most rows of the original image read at once
+        self.STRIP_HEIGHT = 256
+
+        # Rows of characters rendered at once when writing the ASCII image
+        self.RENDER_BAND_ROWS = 16
+
+        self.upscale = 1
+
+    def set_colour(self, colour: bool=True, palette: str="truecolor"):
+        """
+        Colour isn't supported when reading in strips, the image is always converted in grayscale.
+
+        Returns False.
+        """
+        print(f"{bcolors.WARNING}[-] Colour isn't supported for tiled images yet, converting in grayscale :< {bcolors.ENDC}\n")
+        return False
+
+    def set_image(self, image_path: str):
+        """
+        Opens the image for reading in strips, .npy files and binary PGM / PPM files are memory mapped,
+        JPEGs are decoded by cv2 at a reduced size that still has enough detail for the ASCII chars count,
+        so set that first. Other formats can't be read without decoding them whole, so they aren't opened.
+
+        Returns True if the image is opened successfully.
+        """
+        if not os.path.exists(image_path):
+            print(f"{bcolors.WARNING}[-] Image file of path '{image_path}' does not exist 0.o {bcolors.ENDC}\n")
+            return False
+
+        ext = os.path.splitext(image_path)[1].lower()
+
+        try:
+            if ext == ".npy":
+                self.strip_reader = ArrayStripReader(np.load(image_path, mmap_mode='r'))
+            elif ext in NETPBM_EXTENSIONS:
+                self.strip_reader = open_netpbm(image_path)
+            else:
+                self.strip_reader = open_reduced(image_path, self.horizontal_ascii_chars_count, self.vertical_ascii_chars_count)
+        except ValueError as e:
+            print(f"{bcolors.WARNING}[-] Could not open '{image_path}', {e} 0.o {bcolors.ENDC}\n")
+            return False
+
+        if self.strip_reader is None:
+            print(f"{bcolors.WARNING}[-] Could not read '{image_path}' as an image 0.o {bcolors.ENDC}\n")
+            return False
+
+        self.image_path = image_path
+        self.image_array = None
+        self.image_height, self.image_width = self.strip_reader.height, self.strip_reader.width
+        self.original_height, self.original_width = self.strip_reader.height, self.strip_reader.width
+        return True
+
+    def set_image_by_array(self, image_array):
+        """
+        Sets the image to an array that is read in strips, e.g. a np.memmap.
+
+        Returns True if the image is set successfully.
+        """
+        try:
+            self.strip_reader = ArrayStripReader(image_array)
+        except ValueError as e:
+            print(f"{bcolors.WARNING}[-] {e} 0.o {bcolors.ENDC}\n")
+            return False
+
+        self.image_array = None
+        self.image_height, self.image_width = self.strip_reader.height, self.strip_reader.width
+        self.original_height, self.original_width = self.strip_reader.height, self.strip_reader.width
+        return True
+
+    def scale_image(self):
+        """
+        Reads the image a strip at a time and sets `self.image_array` to the average of every cell
+        of the character grid, the same size `IMG2ASCIIConverter.scale_image` would give.
+
+        Returns scaled image.
+        """
+        if self.strip_reader is None:
+            print(f"{bcolors.WARNING}[!] No image has been set yet /_ \ {bcolors.ENDC}\n")
+            return
+
+        width, height = self.get_scaled_size()
+        width, height = max(1, width), max(1, height)
+        source_height, source_width = self.strip_reader.height, self.strip_reader.width
+
+        # Source pixels covered by every cell, cells of a grid bigger than the image just take the pixel they land on
+        column_edges = np.arange(width + 1) * source_width // width
+        row_edges = np.arange(height + 1) * source_height // height
+        column_counts = np.maximum(np.diff(column_edges), 1).astype(np.uint64)
+
+        scaled = np.empty((height, width), dtype=np.uint8)
+        column_sums = np.empty(source_width, dtype=np.uint64)
+
+        for i in range(height):
+            row_start = row_edges[i]
+            row_end = max(row_edges[i + 1], row_start + 1)
+            column_sums[:] = 0
+
+            for strip_start in range(row_start, row_end, self.STRIP_HEIGHT):
+                strip = self.strip_reader.read_rows(strip_start, min(strip_start + self.STRIP_HEIGHT, row_end))
+                column_sums += strip.sum(axis=0, dtype=np.uint64)
+
+            cell_sums = np.add.reduceat(column_sums, column_edges[:-1])
+            cell_counts = column_counts * (row_end - row_start)
+            scaled[i] = (cell_sums + cell_counts // 2) // cell_counts
+
+        self.image_array = scaled
+        self.image_height, self.image_width = scaled.shape
+
+        return self.image_array
+
+    def create_image(self, upscale: int=1):
+        """
+        Gets the glyphs ready for `write_to_image_file`, which renders the ASCII image while writing it,
+        so there is never a whole ASCII image in `self.ascii_image_array`.
+
+        Returns True if successful.
+        """
+        if self.image_ascii_chars == "":
+            print(f"{bcolors.WARNING}[!] Nothing to write when creating image, try create text first :3 {bcolors.ENDC}\n")
+            return False
+
+        self.upscale = upscale
+        self._get_glyph_atlas()
+        return True
+
+    def _get_glyph_atlas(self):
+        """
+        Returns the glyph atlas for the current gscale and font size, shouldn't be called outside class.
+        """
+        fontsize = self._get_fontsize(self.upscale)
+        atlas_key = (self.image_ascii_gscale, fontsize)
+
+        if atlas_key not in self.glyph_atlases:
+            line_spacing = self.CANVAS_HEIGHT_INCREASE_PERCENTAGE * self.LINE_HEIGHT_INCREASE_PERCENTAGE
+            self.glyph_atlases[atlas_key] = GlyphAtlas(self.image_ascii_gscale, fontsize, line_spacing, self.FONT_FACE)
+
+        return self.glyph_atlases[atlas_key]
+
+    def write_to_image_file(self, image_file_path: str="", extension: str=""):
+        """
+        Renders the ASCII image a band of rows at a time into a grayscale PNG file.
+
+        If no path is provided, the output path will be the original image path name with _ascii inserted,
+        the extension is always changed to .png.
+
+        Returns True if write succesful.
+        """
+        if image_file_path == "":
+            image_file_path = os.path.splitext(self.image_path)[0] + "_ascii.png"
+
+        image_file_path = os.path.splitext(image_file_path)[0] + ".png"
+
+        if self.image_ascii_chars == "":
+            print(f"{bcolors.WARNING}[!] Nothing to write when saving image, try create text first /^\ {bcolors.ENDC}\n")
+            return False
+
+        indices = self.image_ascii_indices
+
+        # Text made by the loop version has no index grid, so work it out from the text
+        if indices is None:
+            char_to_index = {char: i for i, char in reversed(list(enumerate(self.image_ascii_gscale)))}
+            indices = np.array([[char_to_index[char] for char in line] for line in self.image_ascii_chars.split('\n')], dtype=np.uint8)
+
+        atlas = self._get_glyph_atlas()
+        rows, columns = indices.shape
+
+        print(f"{bcolors.WARNING}[!] Writing to image file of path {image_file_path} :3 {bcolors.ENDC}\n")
+
+        writer = StreamingPNGWriter(image_file_path, columns * atlas.cell_width, rows * atlas.cell_height)
+
+        try:
+            for start in range(0, rows, self.RENDER_BAND_ROWS):
+                writer.write_rows(atlas.render_rows(indices, start, min(start + self.RENDER_BAND_ROWS, rows)))
+
+            writer.close()
+        finally:
+            # Only does anything if rendering failed, the writer is already closed otherwise
+            writer.abort()
+
+        print(f"{bcolors.WARNING}[+] Finished writing to image file of path {image_file_path} ·w· {bcolors.ENDC}\n")
+
+        return True
+
+
+if __name__ == "__main__":
+    t0 = time.time()
+
+    converter = TiledIMG2ASCIIConverter()
+    converter.set_ascii_chars_count(200, 200)
+    converter.set_image("a.ppm")  # Set file path here, or use set_image_by_array with a np.memmap
+    converter.scale_image()
+    converter.create_text()
+    converter.create_image()
+    converter.write_to_text_file()
+    converter.write_to_image_file()
+
+    print(f"{bcolors.WARNING}Wow all that took {(time.time() - t0):.2f}s {bcolors.ENDC}\n")
@@ -0,0 +1,171 @@
+"""
+Python file for timing every stage of converting images and videos, to find out which one is holding things up.
+"""
+
+from contextlib import contextmanager, nullcontext
+import csv
+import json
+import numpy as np
+import threading
+import time
+import tracemalloc
+
+from helper import bcolors
+
+
+# Stages in the order they happen to a frame, stages with other names are listed after these
+STAGES = ["seek", "decode", "grayscale", "scale_image", "create_text", "create_image", "resize_output", "encode"]
+
+_no_stage = nullcontext()
+
+
+def profile_stage(profiler, name: str):
+    """
+    Returns `profiler.stage(name)`, or a context manager that does nothing if `profiler` is None,
+    so code can always be wrapped in a stage whether it is being profiled or not.
+    """
+    return _no_stage if profiler is None else profiler.stage(name)
+
+
+class StageProfiler:
+    """
+    Records how long every run of every stage takes, and with `trace_allocations` also how much memory
+    it allocated at most (using tracemalloc, which slows everything down a bit).
+
+    Stages shouldn't be inside each other when tracing allocations. Stages can be recorded from
+    several threads at once, but allocations are counted for the whole process, so they only
+    mean something when one thing runs at a time.
+    """
+
+    def __init__(self, trace_allocations: bool=False) -> None:
+        self.trace_allocations = trace_allocations
+        self.samples = {}  # Stage name -> list of (seconds, bytes allocated)
+        self.lock = threading.Lock()
+        self.started_tracing = False
+
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager that records the time (and allocations) of everything run inside it as one run of stage `name`.
+        """
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        t0 = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            allocated = tracemalloc.get_traced_memory()[1] - start_memory if self.trace_allocations else 0
+            self.record(name, seconds, allocated)
+
+    def record(self, name: str, seconds: float, allocated: int=0):
+        """
+        Records one run of stage `name` that was timed some other way.
+        """
+        with self.lock:
+            self.samples.setdefault(name, []).append((seconds, allocated))
+
+    def merge(self, samples: dict):
+        """
+        Adds the samples of another profiler, e.g. one from a worker process.
+        """
+        with self.lock:
+            for name, stage_samples in samples.items():
+                self.samples.setdefault(name, []).extend(tuple(sample) for sample in stage_samples)
+
+    def stats(self):
+        """
+        Returns {stage: {"count", "total", "mean", "p50", "p95", "max", "allocated_p50", "allocated_max"}},
+        times in seconds and allocations in bytes, stages in the order of `STAGES`.
+        """
+        with self.lock:
+            samples = {name: np.array(stage_samples, dtype=np.float64) for name, stage_samples in self.samples.items()}
+
+        names = [name for name in STAGES if name in samples] + sorted(name for name in samples if name not in STAGES)
+        stats = {}
+
+        for name in names:
+            seconds, allocated = samples[name][:, 0], samples[name][:, 1]
+            stats[name] = {
+                "count": len(seconds),
+                "total": float(seconds.sum()),
+                "mean": float(seconds.mean()),
+                "p50": float(np.percentile(seconds, 50)),
+                "p95": float(np.percentile(seconds, 95)),
+                "max": float(seconds.max()),
+                "allocated_p50": int(np.percentile(allocated, 50)),
+                "allocated_max": int(allocated.max()),
+            }
+
+        return stats
+
+    def slowest_stage(self):
+        """
+        Returns the name of the stage that took the most time in total, None if nothing was recorded.
+        """
+        stats = self.stats()
+        return max(stats, key=lambda name: stats[name]["total"]) if stats else None
+
+    def print_stats(self):
+        """
+        Prints a table of the stats of every stage.
+        """
+        stats = self.stats()
+
+        if not stats:
+            print(f"{bcolors.WARNING}[!] Nothing was profiled ._. {bcolors.ENDC}\n")
+            return
+
+        print(f"{bcolors.OKCYAN}{'stage':<14}{'count':>8}{'total':>11}{'p50':>11}{'p95':>11}{'max':>11}{'alloc p50':>12}{'alloc max':>12}{bcolors.ENDC}")
+
+        for name, stage_stats in stats.items():
+            print(f"{bcolors.OKCYAN}{name:<14}{stage_stats['count']:>8}{stage_stats['total']:>10.3f}s"
+                  f"{stage_stats['p50'] * 1000:>9.3f}ms{stage_stats['p95'] * 1000:>9.3f}ms{stage_stats['max'] * 1000:>9.3f}ms"
+                  f"{stage_stats['allocated_p50'] / 1024:>10.0f}KB{stage_stats['allocated_max'] / 1024:>10.0f}KB{bcolors.ENDC}")
+
+        print(f"\n{bcolors.WARNING}[!] Most time went to {self.slowest_stage()} (ง'̀-'́)ง {bcolors.ENDC}\n")
+
+    def write_json(self, json_path: str):
+        """
+        Writes the stats of every stage to a JSON file.
+        """
+        with open(json_path, mode='w') as f:
+            json.dump({"trace_allocations": self.trace_allocations, "stages": self.stats()}, f, indent=2)
+
+    def write_csv(self, csv_path: str):
+        """
+        Writes the stats of every stage to a CSV file, one row per stage.
+        """
+        stats = self.stats()
+        columns = ["count", "total", "mean", "p50", "p95", "max", "allocated_p50", "allocated_max"]
+
+        with open(csv_path, mode='w', newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage"] + columns)
+
+            for name, stage_stats in stats.items():
+                writer.writerow([name] + [stage_stats[column] for column in columns])
+
+    def write(self, stats_path: str):
+        """
+        Writes the stats to a CSV file if `stats_path` ends with .csv, otherwise to a JSON file.
+        """
+        if stats_path.lower().endswith(".csv"):
+            self.write_csv(stats_path)
+        else:
+            self.write_json(stats_path)
+
+    def close(self):
+        """
+        Stops tracemalloc if this profiler started it.
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
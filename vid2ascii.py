@@ -2,17 +2,229 @@
 Python file for Converter Class for converting Video to ASCII characters.
 """
 
+from collections import OrderedDict
 import cv2
 import os
-import imageio
-from imageio_ffmpeg import get_ffmpeg_exe
+from multiprocessing import shared_memory
+import multiprocessing
 import numpy as np
+import queue
 import shutil
-from moviepy.editor import VideoFileClip, AudioFileClip
+import subprocess
+import sys
+import threading
 import time
 
+from ascii_archive import ASCIIArchiveReader, ASCIIArchiveWriter, default_archive_path
+from ffmpeg_writer import FFmpegPipeWriter, audio_codec_arguments, trimmed_input
 from img2ascii import IMG2ASCIIConverter
 from helper import bcolors
+from profiler import StageProfiler, profile_stage
+
+
+class FrameCache:
+    """
+    Remembers rendered ASCII images by their grid of characters, so frames that come up again
+    (slides, paused scenes, looping GIFs) aren't rendered again.
+
+    With `tolerance` above 0, a frame whose grid differs from the last rendered one
+    in fewer than `tolerance` cells reuses that render as well.
+    """
+
+    def __init__(self, max_frames: int=64, tolerance: int=0) -> None:
+        self.max_frames = max_frames
+        self.tolerance = tolerance
+        self.frames = OrderedDict()  # Hash of grid -> (grid, rendered image), least recently used first
+
+        self.previous_indices = None
+        self.previous_image = None
+
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, indices):
+        """
+        Returns the rendered image of a grid that is the same (or close enough to the last one), None if there isn't one.
+        """
+        self.lookups += 1
+        key = hash(indices.tobytes())
+        cached = self.frames.get(key)
+
+        # Make sure it is actually the same grid and not just the same hash
+        if cached is not None and cached[0].shape == indices.shape and np.array_equal(cached[0], indices):
+            self.frames.move_to_end(key)
+            self.hits += 1
+            self.previous_indices, self.previous_image = cached
+            return cached[1]
+
+        if (self.tolerance > 0 and self.previous_indices is not None and self.previous_indices.shape == indices.shape
+                and np.count_nonzero(self.previous_indices != indices) < self.tolerance):
+            self.hits += 1
+            return self.previous_image
+
+        return None
+
+    def store(self, indices, image):
+        """
+        Remembers the rendered image of a grid.
+        """
+        self.previous_indices, self.previous_image = indices, image
+        self.frames[hash(indices.tobytes())] = (indices, image)
+
+        while len(self.frames) > self.max_frames:
+            self.frames.popitem(last=False)
+
+
+class FrameWriter:
+    """
+    Writer stage that hands frames to a video writer (anything with `append_data` and `close`) from its own thread,
+    so converting the next frame and encoding the last one happen at the same time.
+
+    Frames are copied into a fixed set of slots made when the first frame comes in, converted on the way to
+    `pixel_format` ("gray", "mono" which is only black and white, "bgr" or "rgb"), which is usually a lot smaller
+    than the BGRA frames of the converter.
+    There are `max_frames` slots, fewer if `max_bytes` is above 0 and they wouldn't fit in it, but always at least one.
+    `put` waits for a slot to be free, so nothing piles up if the encoder is slower than the conversion.
+    """
+
+    # Conversions into each pixel format, by number of channels of the frame coming in
+    CONVERSIONS = {
+        "gray": {3: cv2.COLOR_BGR2GRAY, 4: cv2.COLOR_BGRA2GRAY},
+        "mono": {3: cv2.COLOR_BGR2GRAY, 4: cv2.COLOR_BGRA2GRAY},
+        "bgr": {1: cv2.COLOR_GRAY2BGR, 4: cv2.COLOR_BGRA2BGR},
+        "rgb": {1: cv2.COLOR_GRAY2RGB, 3: cv2.COLOR_BGR2RGB, 4: cv2.COLOR_BGRA2RGB},
+    }
+
+    def __init__(self, video_writer, pixel_format: str="gray", max_frames: int=8, max_bytes: int=0, profiler=None) -> None:
+        if pixel_format not in self.CONVERSIONS:
+            raise ValueError(f"Unknown pixel format '{pixel_format}', choose from {list(self.CONVERSIONS)}")
+
+        self.video_writer = video_writer
+        self.pixel_format = pixel_format
+        self.max_frames = max(1, max_frames)
+        self.max_bytes = max_bytes
+        self.profiler = profiler
+
+        self.slots = None
+        self.free_slots = queue.Queue()
+        self.written_slots = queue.Queue()  # Slot numbers in the order they are to be written, None to stop
+        self.thread = None
+        self.error = None
+        self.closed = False
+        self.aborted = False
+
+    def _create_slots(self, frame):
+        """
+        Makes the slots for frames of the same size as `frame` and starts the writer thread, shouldn't be called outside class.
+        """
+        height, width = frame.shape[:2]
+        slot_shape = (height, width) if self.pixel_format in ("gray", "mono") else (height, width, 3)
+        slot_count = self.max_frames
+
+        if self.max_bytes > 0:
+            slot_count = max(1, min(slot_count, self.max_bytes // int(np.prod(slot_shape))))
+
+        self.slots = np.empty((slot_count, *slot_shape), dtype=np.uint8)
+
+        for slot in range(slot_count):
+            self.free_slots.put(slot)
+
+        self.thread = threading.Thread(target=self._write_slots, daemon=True)
+        self.thread.start()
+
+    def _write_slots(self):
+        """
+        Writes slots as they come in until it gets None, shouldn't be called outside class.
+        """
+        for slot in iter(self.written_slots.get, None):
+            try:
+                if self.error is None and not self.aborted:
+                    with profile_stage(self.profiler, "encode"):
+                        self.video_writer.append_data(self.slots[slot])
+            except BaseException as e:
+                self.error = e
+            finally:
+                self.free_slots.put(slot)
+
+    def put(self, frame):
+        """
+        Copies a frame into the next free slot in the pixel format of the writer, waiting for one to be free first,
+        and queues it to be written. `frame` can be changed or reused as soon as this returns.
+
+        Raises whatever the video writer raised if writing an earlier frame failed.
+        """
+        if self.closed:
+            raise ValueError("Frame given to a writer that is already closed")
+
+        if self.slots is None:
+            self._create_slots(frame)
+
+        if self.error is not None:
+            raise self.error
+
+        slot = self.free_slots.get()
+        channels = 1 if frame.ndim == 2 else frame.shape[2]
+
+        if frame.shape[:2] != self.slots.shape[1:3]:
+            self.free_slots.put(slot)
+            raise ValueError(f"Frame of shape {frame.shape} given to writer of frames of shape {self.slots.shape[1:]}")
+
+        if channels in self.CONVERSIONS[self.pixel_format]:
+            cv2.cvtColor(frame, self.CONVERSIONS[self.pixel_format][channels], dst=self.slots[slot])
+        else:
+            self.slots[slot] = frame.reshape(self.slots.shape[1:])
+
+        if self.pixel_format == "mono":
+            cv2.threshold(self.slots[slot], 127, 255, cv2.THRESH_BINARY, dst=self.slots[slot])
+
+        self.written_slots.put(slot)
+
+    def close(self):
+        """
+        Waits for every frame to be written, then closes the video writer.
+
+        Raises whatever the video writer raised if writing any frame failed, aborting the video writer then.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self.thread is not None:
+            self.written_slots.put(None)
+            self.thread.join()
+
+        if self.error is not None:
+            # A video missing frames shouldn't be finished as if it were complete
+            if hasattr(self.video_writer, "abort"):
+                self.video_writer.abort()
+            else:
+                self.video_writer.close()
+
+            raise self.error
+
+        self.video_writer.close()
+
+    def abort(self):
+        """
+        Drops the frames that weren't written yet and stops the writer thread, then aborts the video writer
+        if it can be (like `FFmpegPipeWriter`) so no half written video is left behind, or closes it otherwise.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        self.aborted = True
+
+        # Stopping ffmpeg first makes a write the thread is stuck in fail straight away
+        if hasattr(self.video_writer, "abort"):
+            self.video_writer.abort()
+        else:
+            self.video_writer.close()
+
+        if self.thread is not None:
+            self.written_slots.put(None)
+            self.thread.join()
 
 
 class VID2ASCIIConverter:
@@ -31,13 +243,36 @@ class VID2ASCIIConverter:
         self.fps = -1
         self.total_frame_count = -1
 
+        # Part of the video to convert and how many frames a second to keep, see `set_time_range` and `set_output_fps`
+        self.start_time = 0.0
+        self.end_time = -1
+        self.output_fps = 0
+
         # Video writer stuff
         self.video_writer = None
         self.video_output_path = None
-        self.temp_video_output_path = "./out.mp4"
-        self.VIDEO_WRITER_REPEAT_CYCLE = 50  # Video writer will write frames to output every ?? frames
-        self.converter_video_frames_buffer = [None] * self.VIDEO_WRITER_REPEAT_CYCLE
-        
+        self.video_writer_preset = "slower"  # x264 preset used when encoding
+        self.video_writer_audio = True  # Whether to copy the original audio into the output
+        self.frame_writer = None  # Writer stage in front of the video writer, see `set_writer_buffer`
+        self.writer_max_frames = 8
+        self.writer_max_bytes = 0
+
+        # GIF output, see `set_gif_output`
+        self.gif_fontsize = 12
+        self.gif_palette = "gray"
+
+        # Frame cache stuff, see `set_frame_cache`
+        self.frame_cache_size = 0
+        self.frame_cache_tolerance = 0
+        self.frame_cache_lookups = 0
+        self.frame_cache_hits = 0
+
+        # Stats of the last `play_in_terminal`
+        self.playback_stats = None
+
+        # Records how long every stage takes if set, see `set_profiler`
+        self.profiler = None
+
     def init_image_to_ascii_converter(self, horizontal: int=100, vertical: int=100):
         """
         Sets the horizontal and vertical ASCII characters count.
@@ -48,6 +283,102 @@ class VID2ASCIIConverter:
         """
         self.image_to_ascii_converter.set_ascii_chars_count(horizontal, vertical)
 
+    def set_render_backend(self, backend: str):
+        """
+        Sets the backend used to render every frame, either "cairo" or "atlas".
+
+        Returns True if backend is set successfully.
+        """
+        return self.image_to_ascii_converter.set_render_backend(backend)
+
+    def set_incremental_render(self, incremental: bool=True):
+        """
+        Only redraw the characters that changed since the last frame, instead of the whole frame.
+        """
+        self.image_to_ascii_converter.set_incremental_render(incremental)
+
+    def set_shape_matching(self, shape_matching: bool=True):
+        """
+        Picks every character by its shape as well as its brightness, which keeps edges sharp with
+        about half as many characters, see `IMG2ASCIIConverter.set_shape_matching`.
+        """
+        self.image_to_ascii_converter.set_shape_matching(shape_matching)
+
+    def set_colour(self, colour: bool=True, palette: str="truecolor"):
+        """
+        Colours every character with the mean colour of the part of the frame it stands for,
+        `palette` is used when playing in the terminal, either "truecolor" or "256".
+
+        Frames in colour aren't put in the frame cache, since it only looks at the characters.
+
+        Returns True if colour is set successfully.
+        """
+        return self.image_to_ascii_converter.set_colour(colour, palette)
+
+    def set_profiler(self, profiler):
+        """
+        Records the time of every stage of every frame (decode, grayscale, `scale_image`, `create_text`,
+        `create_image`, resize to output and encode) to a `profiler.StageProfiler`, None stops recording.
+
+        Worker processes record to their own profilers, which are merged into this one when they finish.
+        """
+        self.profiler = profiler
+        self.image_to_ascii_converter.set_profiler(profiler)
+
+    def set_frame_cache(self, max_frames: int=64, tolerance: int=0):
+        """
+        Reuse the rendered image of frames whose grid of characters was already rendered,
+        keeping up to `max_frames` of them, 0 turns it off.
+
+        With `tolerance` above 0, frames that differ from the last rendered one in fewer than
+        `tolerance` characters reuse it as well. Each worker has its own cache when converting in parallel.
+        """
+        self.frame_cache_size = max_frames
+        self.frame_cache_tolerance = tolerance
+
+    def set_writer_buffer(self, max_frames: int=8, max_bytes: int=0):
+        """
+        Sets how many converted frames can wait to be encoded at once, at most `max_frames`
+        and, if `max_bytes` is above 0, no more than fit in that many bytes (at least one frame either way).
+
+        Converting waits for the encoder once it is full, instead of piling frames up in memory.
+        """
+        self.writer_max_frames = max_frames
+        self.writer_max_bytes = max_bytes
+
+    def set_gif_output(self, fontsize: int=12, palette: str="gray"):
+        """
+        Sets how GIFs are made, the characters are drawn at `fontsize` and the frames are written at that size
+        instead of being resized to the size of the video. `palette` is "gray", or "mono" for only black and white,
+        which makes smaller files but loses the edges of the characters. GIFs in colour always get a colour palette.
+
+        Returns True if it is set successfully.
+        """
+        if palette not in ("gray", "mono"):
+            print(f"{bcolors.WARNING}[-] Unknown GIF palette '{palette}', pick gray or mono 0.o {bcolors.ENDC}\n")
+            return False
+
+        self.gif_fontsize = fontsize
+        self.gif_palette = palette
+        return True
+
+    def set_output_fps(self, fps: float=0):
+        """
+        Only converts as many frames as needed for `fps` frames a second, ASCII motion looks the same at 15 - 24 fps anyway.
+        Frames in between are grabbed without being retrieved, so they are never turned into images.
+
+        0, or anything at or above the fps of the video, keeps every frame.
+        """
+        self.output_fps = max(0, fps)
+
+    def set_time_range(self, start_time: float=0, end_time: float=-1):
+        """
+        Only converts the part of the video from `start_time` to `end_time` seconds, -1 being the end of the video.
+        The video is seeked to the start, and the audio is cut to the same part.
+        """
+        self.start_time = max(0, start_time)
+        self.end_time = end_time
+
     def set_video(self, video_path: str):
         """
         Sets the `self.video_capture` by using cv2.VideoCapture(video_path).
@@ -67,18 +398,29 @@ class VID2ASCIIConverter:
         self.fps = self.video_capture.get(cv2.CAP_PROP_FPS)
         self.total_frame_count = int(self.video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
 
+        # The video is encoded to H.264, which every container can't hold (e.g. .webm), so it is always written as .mp4, or as a GIF for GIFs
         root, ext = os.path.splitext(video_path)
+        ext = ".gif" if ext.lower() == ".gif" else ".mp4"
         self.video_output_path = (root + "_ascii" + ext).replace(" ", "_")  # No spaces
         
         return True
 
-    def create_video(self, gscale_level: int=0, compression_speed="slower", add_original_audio=True):
+    def create_video(self, gscale_level: int=0, compression_speed="slower", add_original_audio=True, threads: int=0, workers: int=0):
         """
         Create video of ASCII characters from frame.
 
         @param compression_speed: Choose from 
         ultrafast, superfast, veryfast, faster, fast, medium, slow, slower, veryslow, placebo.
         The slower the better the compression.
+
+        @param add_original_audio: Copy the audio of the original video into the output,
+        done by the same ffmpeg process that encodes the frames.
+
+        @param threads: If more than 0, decode, convert and encode in a pipeline of threads
+        with this many converter threads, otherwise do everything one frame at a time.
+
+        @param workers: If more than 0, convert frames in this many processes instead,
+        which gets around the GIL. Takes priority over `threads`.
         """
         # Check if got video
         if self.video_capture is None:
@@ -86,110 +428,979 @@ class VID2ASCIIConverter:
             return False
 
         # Check if is gif
-        is_gif = False
-        
-        print(os.path.splitext(self.video_path)[-1].lower())
-        if 'gif' in os.path.splitext(self.video_path)[-1].lower():
+        converter = self.image_to_ascii_converter
+        render_size = (converter.render_fontsize, converter.resize_output)
+
+        if self._is_gif_output():
             print(f"{bcolors.WARNING}[!] Correct me if I'm wrong but this is a GIF, ... right??{bcolors.ENDC}\n")
-            is_gif = True
+
+            # GIFs are drawn small and written at the size they are drawn at
+            converter.set_render_size(self.gif_fontsize, resize_output=False)
+
+        self.video_writer_preset = self._check_compression_speed(compression_speed)
+        self.video_writer_audio = add_original_audio
 
         # While loop to slowly loop through video
         print(f"{bcolors.WARNING}[!] Converting frames to ASCII characters and writing frames to output video {bcolors.ENDC}\n")
 
-        ret, frame = self.video_capture.read()
+        self.frame_cache_lookups = self.frame_cache_hits = 0
+        finished = False
+
+        try:
+            if workers > 0:
+                self._convert_frames_in_processes(gscale_level, workers)
+            elif threads > 0:
+                self._convert_frames_pipelined(gscale_level, threads)
+            else:
+                self._convert_frames(gscale_level)
+
+            self._close_frame_writer()
+            finished = True
+        finally:
+            converter.set_render_size(*render_size)
+
+            # Don't leave ffmpeg, the writer thread or a half written temp file behind if anything failed
+            if not finished:
+                self._abort_frame_writer()
+
+        print(f"\n{bcolors.WARNING}[!] Video created ლ(╹◡╹ლ) {bcolors.ENDC}\n")
+
+        self._print_frame_cache_stats()
+
+        return True
+
+    def create_archive(self, archive_path: str="", gscale_level: int=0, delta: bool=True):
+        """
+        Converts every frame to ASCII characters and saves their grids of gscale indices to an
+        ASCII video archive, without rendering or encoding anything. The archive can be rendered
+        later in any style with `render_archive`, without decoding the video again.
+
+        If no archive path is given, it will be the video path with _ascii.a2v.
+
+        @param delta: Store frames as the difference from the frame before when that is smaller.
+        """
+        # Check if got video
+        if self.video_capture is None:
+            print(f"{bcolors.WARNING}[!] Wow slow down there Jose, no video is set yet >:/{bcolors.ENDC}\n")
+            return False
+
+        archive_path = archive_path if archive_path != "" else default_archive_path(self.video_path)
+        converter = self.image_to_ascii_converter
+        archive_writer = None
+
+        print(f"{bcolors.WARNING}[!] Converting frames to ASCII characters and writing them to archive {archive_path} {bcolors.ENDC}\n")
 
         i = 0
 
         t0 = time.time()
 
-        while ret:
-            # Get grayscale frame, and convert to ASCII image
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            self.image_to_ascii_converter.set_image_by_array(gray_frame)
-            self.image_to_ascii_converter.scale_image()
-            self.image_to_ascii_converter.create_text(gscale_level=gscale_level)
-            self.image_to_ascii_converter.create_image()
+        try:
+            for frame in self._read_frames():
+                converter.set_image_by_array(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+                converter.scale_image()
+                converter.create_text(gscale_level=gscale_level)
+
+                # The first frame decides the size of the grid
+                if archive_writer is None:
+                    rows, columns = converter.image_ascii_indices.shape
+                    archive_writer = ASCIIArchiveWriter(archive_path, self._get_output_fps(), columns, rows, converter.image_ascii_gscale,
+                                                        converter.original_width, converter.original_height, delta=delta)
+
+                archive_writer.append(converter.image_ascii_indices)
+
+                i += 1
+                self._print_progress(i, t0)
+        finally:
+            if archive_writer is not None:
+                archive_writer.close()
+
+        print(f"\n{bcolors.WARNING}[+] Finished writing archive of {i} frames to {archive_path} ·v· {bcolors.ENDC}\n")
+
+        return True
+
+    def render_archive(self, archive_path: str, video_output_path: str="", compression_speed="slower", upscale: int=1):
+        """
+        Renders an ASCII video archive made by `create_archive` to a video, with the current render settings.
+
+        If no output path is given, it will be the archive path with .mp4.
+        """
+        if not os.path.exists(archive_path):
+            print(f"{bcolors.WARNING}[-] Archive file of path '{archive_path}' does not exist 0.o {bcolors.ENDC}\n")
+            return False
+
+        video_output_path = video_output_path if video_output_path != "" else os.path.splitext(archive_path)[0] + ".mp4"
+        archive_reader = ASCIIArchiveReader(archive_path)
+        video_writer = FFmpegPipeWriter(video_output_path, archive_reader.fps, preset=self._check_compression_speed(compression_speed))
+        converter = self.image_to_ascii_converter
+        frame_writer = FrameWriter(video_writer, "bgr" if converter.colour else "gray", self.writer_max_frames, self.writer_max_bytes, self.profiler)
+
+        print(f"{bcolors.WARNING}[!] Rendering {len(archive_reader)} frames of archive {archive_path} to {video_output_path} {bcolors.ENDC}\n")
+
+        t0 = time.time()
+
+        try:
+            for i in range(len(archive_reader)):
+                converter.set_ascii_indices(archive_reader.get_frame(i), archive_reader.gscale,
+                                            archive_reader.source_width, archive_reader.source_height)
+                converter.create_image(upscale=upscale)
+                frame_writer.put(converter.ascii_image_array)
+
+                print(f"{bcolors.WARNING}[!] Frame {i + 1} out of {len(archive_reader)} rendered. About {((time.time() - t0) / (i + 1)) * (len(archive_reader) - i - 1):.2f}s to go! ඞ {bcolors.ENDC}")
+
+            frame_writer.close()
+        finally:
+            # Only does anything if rendering failed, the writer is already closed otherwise
+            frame_writer.abort()
+            archive_reader.close()
 
-            # Save to frame buffer, and update time in 5 cycle moving average of time taken
-            self.converter_video_frames_buffer[i % self.VIDEO_WRITER_REPEAT_CYCLE] = self.image_to_ascii_converter.ascii_image_array
+        print(f"\n{bcolors.WARNING}[!] Video created ლ(╹◡╹ლ) {bcolors.ENDC}\n")
+
+        return True
 
-            # Every fifty cycle append frame to output video, then clear buffer
-            if i % self.VIDEO_WRITER_REPEAT_CYCLE == (self.VIDEO_WRITER_REPEAT_CYCLE - 1):
-                for frame in self.converter_video_frames_buffer:
-                    self.append_frames_to_output(frame, not is_gif)
-                self.converter_video_frames_buffer = [None] * self.VIDEO_WRITER_REPEAT_CYCLE
+    def play_in_terminal(self, gscale_level: int=0, output=None):
+        """
+        Plays the video as ASCII characters straight in the terminal at the video's fps (or the output fps if set),
+        without rendering any images or encoding anything.
+
+        Frames that can't be converted in time are skipped without being decoded, and the fps that was
+        actually reached and the number of dropped frames are printed at the end (and kept in `self.playback_stats`).
+
+        @param output: Where to write the frames to, defaults to stdout.
+        """
+        # Check if got video
+        if self.video_capture is None:
+            print(f"{bcolors.WARNING}[!] Wow slow down there Jose, no video is set yet >:/{bcolors.ENDC}\n")
+            return False
+
+        output = sys.stdout if output is None else output
+        target_fps = self._get_output_fps() if self.fps > 0 else 24
+        converter = self.image_to_ascii_converter
+
+        frames_shown = 0
+        frames_dropped = 0
+
+        # Clear the screen and hide the cursor, every frame is then drawn from the top left corner
+        output.write("\033[2J\033[?25l")
+
+        t0 = time.perf_counter()
+
+        try:
+            for frame_index, _ in enumerate(self._select_frames()):
+                # Skip the frames we're already too late for, without retrieving them
+                if frame_index < int((time.perf_counter() - t0) * target_fps):
+                    if not self.video_capture.grab():
+                        break
+
+                    frames_dropped += 1
+                    continue
+
+                ret, frame = self.video_capture.read()
+
+                if not ret:
+                    break
+
+                converter.set_image_by_array(frame if converter.colour else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+                converter.scale_image()
+                text = converter.create_text(gscale_level=gscale_level)
+
+                if converter.colour:
+                    text = converter.create_ansi_text()
+
+                output.write("\033[H" + text)
+                output.flush()
+                frames_shown += 1
+
+                # Wait until it is time for the next frame
+                wait_time = t0 + (frame_index + 1) / target_fps - time.perf_counter()
+
+                if wait_time > 0:
+                    time.sleep(wait_time)
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            output.write("\033[?25h\n")
+            output.flush()
+
+        elapsed_time = time.perf_counter() - t0
+        achieved_fps = frames_shown / elapsed_time if elapsed_time > 0 else 0
+
+        self.playback_stats = {
+            "target_fps": target_fps,
+            "achieved_fps": achieved_fps,
+            "frames_shown": frames_shown,
+            "frames_dropped": frames_dropped,
+        }
+
+        print(f"{bcolors.WARNING}[!] Played at {achieved_fps:.2f} fps out of {target_fps:.2f} fps, dropped {frames_dropped} frame(s) out of {frames_shown + frames_dropped} (¬‿¬) {bcolors.ENDC}\n")
+
+        return True
+
+    def _check_compression_speed(self, compression_speed: str):
+        """
+        Returns the compression speed as an x264 preset, shouldn't be called outside of class.
+        """
+        # Check if compression speed is actually correct, else default to veryslow,
+        # which I think is a good enough speed for a good enouh compression rate
+        if compression_speed.lower() not in ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow", "placebo"]:
+            compression_speed = "veryslow"
+
+        if compression_speed.lower() in ["veryslow", "placebo"]:
+            print(f"{bcolors.WARNING}[!] It will be damn slow for compression, if you don't feel like waiting try change the speed up a bit o((>w< ))o {bcolors.ENDC}\n")
+
+        return compression_speed.lower()
+
+    def _get_frame_range(self):
+        """
+        Returns the (start frame, end frame) of the time range, the end frame is None if it goes to the end of the video,
+        shouldn't be called outside of class.
+        """
+        fps = self.fps if self.fps > 0 else 24
+        start_frame = int(round(self.start_time * fps))
+
+        if self.total_frame_count > 0:
+            start_frame = min(start_frame, self.total_frame_count)
+
+        if self.end_time < 0:
+            return start_frame, None
+
+        return start_frame, max(start_frame, int(round(self.end_time * fps)))
+
+    def _get_output_fps(self):
+        """
+        Returns the fps of the output, shouldn't be called outside of class.
+        """
+        return self.output_fps if 0 < self.output_fps < self.fps else self.fps
+
+    def _get_frame_step(self):
+        """
+        Returns how many frames of the video there are for every output frame (1 or more), shouldn't be called outside of class.
+        """
+        return self.fps / self._get_output_fps() if self.fps > 0 else 1.0
+
+    def _get_output_frame_count(self):
+        """
+        Returns about how many frames will be converted, shouldn't be called outside of class.
+        """
+        start_frame, end_frame = self._get_frame_range()
+        end_frame = self.total_frame_count if end_frame is None or self.total_frame_count > 0 and end_frame > self.total_frame_count else end_frame
+        frame_count = end_frame - start_frame
+
+        return int((frame_count - 1) / self._get_frame_step()) + 1 if frame_count > 0 else 0
+
+    def _get_audio_range(self):
+        """
+        Returns the (start time, duration) of the audio that goes with the converted frames, the duration is -1
+        if it goes to the end, shouldn't be called outside of class.
+        """
+        start_frame, end_frame = self._get_frame_range()
+        fps = self.fps if self.fps > 0 else 24
+
+        return start_frame / fps, -1 if end_frame is None else (end_frame - start_frame) / fps
+
+    def _select_frames(self):
+        """
+        Skips the frames of the time range that are dropped at the output fps, yielding the index of each kept one
+        right before it is to be read, shouldn't be called outside of class.
+        """
+        start_frame, end_frame = self._get_frame_range()
+        return _select_frames(self.video_capture, start_frame, end_frame, start_frame, self._get_frame_step(), self.profiler)
+
+    def _read_frames(self):
+        """
+        Yields every frame of the time range that is kept at the output fps, shouldn't be called outside of class.
+        """
+        for _ in self._select_frames():
+            with profile_stage(self.profiler, "decode"):
+                ret, frame = self.video_capture.read()
+
+            if not ret:
+                return
+
+            yield frame
+
+    def _image_to_ascii_converter_settings(self):
+        """
+        Returns the settings of `self.image_to_ascii_converter` that workers need to make their own converter,
+        as a plain dict so it can be sent to other processes, shouldn't be called outside of class.
+        """
+        return {
+            "horizontal_ascii_chars_count": self.image_to_ascii_converter.horizontal_ascii_chars_count,
+            "vertical_ascii_chars_count": self.image_to_ascii_converter.vertical_ascii_chars_count,
+            "render_backend": self.image_to_ascii_converter.render_backend,
+            "incremental_render": self.image_to_ascii_converter.incremental_render,
+            "shape_matching": self.image_to_ascii_converter.shape_matching,
+            "colour": self.image_to_ascii_converter.colour,
+            "colour_palette": self.image_to_ascii_converter.colour_palette,
+            "render_fontsize": self.image_to_ascii_converter.render_fontsize,
+            "resize_output": self.image_to_ascii_converter.resize_output,
+            "profile_allocations": None if self.profiler is None else self.profiler.trace_allocations,
+        }
+
+    def _new_image_to_ascii_converter(self):
+        """
+        Creates another image to ASCII converter with the same settings as `self.image_to_ascii_converter`,
+        for workers that need their own one, shouldn't be called outside of class.
+        """
+        return _create_image_to_ascii_converter(self._image_to_ascii_converter_settings())
+
+    def _new_frame_cache(self):
+        """
+        Creates a frame cache with the settings from `set_frame_cache`, or None if it is off,
+        shouldn't be called outside of class.
+        """
+        return _create_frame_cache(self.frame_cache_size, self.frame_cache_tolerance)
+
+    def _add_frame_cache_stats(self, lookups: int, hits: int):
+        """
+        Adds the lookups and hits of one frame cache to the totals of this run, shouldn't be called outside of class.
+        """
+        self.frame_cache_lookups += lookups
+        self.frame_cache_hits += hits
+
+    def _print_frame_cache_stats(self):
+        """
+        Prints the hit rate of the frame cache, if it was used, shouldn't be called outside of class.
+        """
+        if self.frame_cache_lookups > 0:
+            print(f"{bcolors.WARNING}[!] Frame cache reused {self.frame_cache_hits} out of {self.frame_cache_lookups} frames ({self.frame_cache_hits / self.frame_cache_lookups:.1%} hit rate) ^o^ {bcolors.ENDC}\n")
+
+    @staticmethod
+    def _convert_frame(converter, frame, gscale_level: int=0, frame_cache=None):
+        """
+        Converts one BGR video frame to an ASCII image with the given converter, and returns it.
+
+        If a frame cache is given, frames with a grid of characters that was already rendered aren't rendered again,
+        unless the converter is in colour.
+
+        Shouldn't be called outside of class.
+        """
+        # In colour the converter takes the colours and the grayscale from the BGR frame itself
+        with profile_stage(converter.profiler, "grayscale"):
+            image = frame if converter.colour else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        converter.set_image_by_array(image)
+        converter.scale_image()
+        converter.create_text(gscale_level=gscale_level)
+
+        if frame_cache is not None and converter.image_ascii_indices is not None and not converter.colour:
+            cached_image = frame_cache.lookup(converter.image_ascii_indices)
+
+            if cached_image is not None:
+                converter.ascii_image_array = cached_image
+                return cached_image
+
+            converter.create_image()
+            frame_cache.store(converter.image_ascii_indices, converter.ascii_image_array)
+        else:
+            converter.create_image()
+
+        return converter.ascii_image_array
+
+    def _print_progress(self, frames_done: int, t0: float):
+        """
+        Prints how many frames are done and roughly how long is left, shouldn't be called outside of class.
+        """
+        frame_count = self._get_output_frame_count()
+        print(f"{bcolors.WARNING}[!] Frame {frames_done} out of {frame_count} completed. About {((time.time() - t0) / frames_done) * max(frame_count - frames_done, 0):.2f}s to go! ඞ {bcolors.ENDC}")
+
+    def _convert_frames(self, gscale_level: int):
+        """
+        Converts and writes every frame one after another, shouldn't be called outside of class.
+        """
+        frame_cache = self._new_frame_cache()
+
+        i = 0
+
+        t0 = time.time()
+
+        for frame in self._read_frames():
+            # Get ASCII image of frame, and hand it to the writer which encodes it while the next one is converted
+            ascii_image_array = self._convert_frame(self.image_to_ascii_converter, frame, gscale_level, frame_cache)
+            self.append_frames_to_output(ascii_image_array)
 
             # Print out info of frame
             i += 1
-            print(f"{bcolors.WARNING}[!] Frame {i} out of {self.total_frame_count} completed. About {((time.time() - t0) / i) * (self.total_frame_count - i):.2f}s to go! ඞ {bcolors.ENDC}")
+            self._print_progress(i, t0)
 
-            # Load next video frame
-            ret, frame = self.video_capture.read()
+        if frame_cache is not None:
+            self._add_frame_cache_stats(frame_cache.lookups, frame_cache.hits)
 
-        # Append remaining frames from buffer, and add audio
-        for frame in self.converter_video_frames_buffer:
-            if frame is None:
-                break
-            else:
-                self.append_frames_to_output(frame)
+    def _convert_frames_pipelined(self, gscale_level: int, threads: int, queue_depth: int=0):
+        """
+        Converts and writes every frame with a decoder thread, `threads` converter threads and an encoder thread,
+        connected by bounded queues, shouldn't be called outside of class.
+
+        At most `queue_depth` frames (default twice the converter threads) are in flight at any time,
+        and frames are written in their original order.
+        """
+        queue_depth = queue_depth if queue_depth > 0 else threads * 2
+
+        # Every frame takes a slot when decoded and gives it back once it is written
+        frame_slots = threading.Semaphore(queue_depth)
+        decoded_frames = queue.Queue(maxsize=queue_depth)
+        converted_frames = queue.Queue()
+        stop = threading.Event()
+        frame_cache_lock = threading.Lock()
+        errors = []
+
+        def run_stage(stage):
+            try:
+                stage()
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        def get_or_stop(from_queue):
+            while not stop.is_set():
+                try:
+                    return True, from_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return False, None
+
+        def put_or_stop(to_queue, item):
+            while not stop.is_set():
+                try:
+                    to_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def decode():
+            for i, frame in enumerate(self._read_frames()):
+                while not frame_slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+
+                if not put_or_stop(decoded_frames, (i, frame)):
+                    return
+
+            # The converters may have stopped on an error, in which case nobody empties the queue
+            for _ in range(threads):
+                if not put_or_stop(decoded_frames, None):
+                    return
+
+        def convert():
+            converter = self._new_image_to_ascii_converter()
+            converter.set_profiler(self.profiler)
+            frame_cache = self._new_frame_cache()
+
+            while True:
+                ok, item = get_or_stop(decoded_frames)
+
+                if not ok:
+                    return
+                if item is None:
+                    if frame_cache is not None:
+                        with frame_cache_lock:
+                            self._add_frame_cache_stats(frame_cache.lookups, frame_cache.hits)
+
+                    converted_frames.put(None)
+                    return
+
+                i, frame = item
+                converted_frames.put((i, self._convert_frame(converter, frame, gscale_level, frame_cache)))
+
+        def encode():
+            pending = {}
+            next_i = 0
+            finished_converters = 0
+            t0 = time.time()
+
+            while finished_converters < threads:
+                ok, item = get_or_stop(converted_frames)
+
+                if not ok:
+                    return
+                if item is None:
+                    finished_converters += 1
+                    continue
+
+                # Hold on to frames that came in early until the ones before them are written
+                pending[item[0]] = item[1]
+
+                while next_i in pending:
+                    self.append_frames_to_output(pending.pop(next_i))
+                    frame_slots.release()
+                    next_i += 1
+                    self._print_progress(next_i, t0)
+
+        stages = [threading.Thread(target=run_stage, args=(decode,))]
+        stages += [threading.Thread(target=run_stage, args=(convert,)) for _ in range(threads)]
+        stages += [threading.Thread(target=run_stage, args=(encode,))]
+
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if errors:
+            raise errors[0]
+
+    def _convert_frames_in_processes(self, gscale_level: int, workers: int, ring_size: int=0):
+        """
+        Converts frames in `workers` processes while this process decodes and encodes, shouldn't be called outside of class.
+
+        Frames are passed through two shared memory ring buffers of `ring_size` slots (default twice the workers),
+        one for decoded frames and one for ASCII images, so only slot numbers go through the queues.
+        """
+        ring_size = ring_size if ring_size > 0 else workers * 2
+
+        # Work out how big the frames going in and out are
+        frame_width = int(self.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(self.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        input_shape = (frame_height, frame_width, 3)
+
+        probe_converter = self._new_image_to_ascii_converter()
+        probe_converter.set_image_by_array(np.zeros(input_shape[:2], dtype=np.uint8))
+
+        if probe_converter.resize_output:
+            output_width, output_height = probe_converter.get_output_size()
+        else:
+            # The size it is drawn at depends on the grid, so draw one to find out
+            probe_converter.scale_image()
+            probe_converter.create_text(gscale_level=gscale_level)
+            probe_converter.create_image()
+            output_height, output_width = probe_converter.ascii_image_array.shape[:2]
+        output_shape = (output_height, output_width, 4)
+
+        input_memory = shared_memory.SharedMemory(create=True, size=ring_size * int(np.prod(input_shape)))
+        output_memory = shared_memory.SharedMemory(create=True, size=ring_size * int(np.prod(output_shape)))
+        input_ring = np.ndarray((ring_size, *input_shape), dtype=np.uint8, buffer=input_memory.buf)
+        output_ring = np.ndarray((ring_size, *output_shape), dtype=np.uint8, buffer=output_memory.buf)
+
+        tasks = multiprocessing.Queue()
+        done = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_convert_frames_worker,
+                args=(self._image_to_ascii_converter_settings(), gscale_level, (self.frame_cache_size, self.frame_cache_tolerance),
+                      input_memory.name, input_shape, output_memory.name, output_shape, ring_size, tasks, done),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+
+        for process in processes:
+            process.start()
+
+        try:
+            frames = self._select_frames()
+            free_slots = list(range(ring_size))
+            converted_slots = {}
+            frames_read = 0
+            frames_written = 0
+            reading = True
+            t0 = time.time()
+
+            while reading or frames_written < frames_read:
+                # Decode straight into free slots of the input ring
+                while reading and free_slots:
+                    slot = free_slots.pop()
+                    ret = next(frames, None) is not None
+
+                    if ret:
+                        with profile_stage(self.profiler, "decode"):
+                            ret, frame = self.video_capture.read(input_ring[slot])
+
+                    if not ret:
+                        reading = False
+                        free_slots.append(slot)
+                        break
+
+                    if not np.shares_memory(frame, input_ring[slot]):
+                        input_ring[slot] = frame
+
+                    tasks.put((frames_read, slot))
+                    frames_read += 1
+
+                if frames_written == frames_read:
+                    continue
+
+                # Wait for a worker to finish something, and make sure they are all still alive
+                try:
+                    i, slot = done.get(timeout=1)
+                except queue.Empty:
+                    if not all(process.is_alive() for process in processes):
+                        raise RuntimeError("A frame conversion worker died")
+                    continue
+
+                converted_slots[i] = slot
+
+                # Write whatever is next in order, then the slot can be used again
+                while frames_written in converted_slots:
+                    slot = converted_slots.pop(frames_written)
+                    self.append_frames_to_output(output_ring[slot])
+                    free_slots.append(slot)
+                    frames_written += 1
+                    self._print_progress(frames_written, t0)
+
+        finally:
+            for _ in processes:
+                tasks.put(None)
+
+            # Collect the frame cache stats and profiles every worker sends before stopping
+            messages_per_worker = (self.frame_cache_size > 0) + (self.profiler is not None)
+
+            for _ in range(len(processes) * messages_per_worker):
+                try:
+                    message, stats = done.get(timeout=5)
+                except queue.Empty:
+                    break
+
+                if message == "frame cache":
+                    self._add_frame_cache_stats(*stats)
+                elif message == "profile":
+                    self.profiler.merge(stats)
+
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+            del input_ring, output_ring
+            input_memory.close()
+            input_memory.unlink()
+            output_memory.close()
+            output_memory.unlink()
+
+    def create_video_segmented(self, gscale_level: int=0, compression_speed="slower", add_original_audio=True,
+                               segments: int=0, workers: int=0, segment_indices=None, keep_segments=False):
+        """
+        Create video of ASCII characters by splitting the video into `segments` time segments
+        (default one per worker), converting and encoding each of them in its own process,
+        then joining them with ffmpeg's concat demuxer without encoding again.
+
+        Segments are kept in a folder next to the output until everything is joined, and segments that are
+        already done are skipped, so a failed run picks up where it stopped.
+
+        @param workers: Number of processes, defaults to number of CPUs.
+
+        @param segment_indices: Only convert these segments, e.g. when several machines share the folder.
+        The video is only joined once every segment is done.
+        """
+        # Check if got video
+        if self.video_capture is None:
+            print(f"{bcolors.WARNING}[!] Wow slow down there Jose, no video is set yet >:/{bcolors.ENDC}\n")
+            return False
+
+        if self._is_gif_output():
+            print(f"{bcolors.WARNING}[!] GIFs can't be joined without encoding again, converting the whole thing in one go instead ._.{bcolors.ENDC}\n")
+            return self.create_video(gscale_level=gscale_level, compression_speed=compression_speed, workers=workers)
+
+        workers = workers if workers > 0 else os.cpu_count()
+        segments = segments if segments > 0 else workers
+        segment_ranges = self._segment_ranges(segments)
+        segment_folder = os.path.splitext(self.video_output_path)[0] + "_segments"
+        segment_paths = [os.path.join(segment_folder, f"segment_{i:04d}.mp4") for i in range(len(segment_ranges))]
+        os.makedirs(segment_folder, exist_ok=True)
+
+        if segment_indices is None:
+            segment_indices = range(len(segment_ranges))
+
+        compression_speed = self._check_compression_speed(compression_speed)
+
+        # Every segment keeps the frames the whole video would, counting from the start of the time range
+        frame_selection = (self._get_frame_range()[0], self._get_frame_step())
+
+        # Skip whatever was finished by an earlier run
+        jobs = [
+            (self.video_path, self._image_to_ascii_converter_settings(), gscale_level, *segment_ranges[i], frame_selection,
+             self._get_output_fps(), segment_paths[i], compression_speed, (self.frame_cache_size, self.frame_cache_tolerance))
+            for i in segment_indices if not _is_segment_done(segment_paths[i], *segment_ranges[i], frame_selection)
+        ]
+
+        print(f"{bcolors.WARNING}[!] Converting {len(jobs)} segment(s) out of {len(segment_ranges)} in {min(workers, max(len(jobs), 1))} process(es) {bcolors.ENDC}\n")
+
+        t0 = time.time()
+        self.frame_cache_lookups = self.frame_cache_hits = 0
+
+        with multiprocessing.Pool(min(workers, max(len(jobs), 1))) as pool:
+            for i, (segment_path, frame_cache_stats, profile_samples) in enumerate(pool.imap_unordered(_convert_segment_worker, jobs), 1):
+                self._add_frame_cache_stats(*frame_cache_stats)
+
+                if profile_samples is not None:
+                    self.profiler.merge(profile_samples)
+
+                print(f"{bcolors.WARNING}[!] Segment {os.path.basename(segment_path)} done, {i} out of {len(jobs)} after {time.time() - t0:.2f}s ඞ {bcolors.ENDC}")
+
+        self._print_frame_cache_stats()
+
+        if not all(_is_segment_done(segment_paths[i], *segment_ranges[i], frame_selection) for i in range(len(segment_ranges))):
+            print(f"{bcolors.WARNING}[!] Not every segment is done yet, run again to join them later :3 {bcolors.ENDC}\n")
+            return False
+
+        # Join the segments and add the audio, without encoding the video again
+        concat_list_path = os.path.join(segment_folder, "segments.txt")
+
+        with open(concat_list_path, mode='w') as f:
+            for segment_path in segment_paths:
+                f.write(f"file '{os.path.abspath(segment_path)}'\n")
+
+        from imageio_ffmpeg import get_ffmpeg_exe
+
+        command = [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", concat_list_path]
+
+        if add_original_audio:
+            command += trimmed_input(self.video_path, *self._get_audio_range())
+            command += ["-map", "0:v:0", "-map", "1:a?", *audio_codec_arguments(self.video_path), "-shortest"]
+
+        subprocess.run(command + ["-c:v", "copy", self.video_output_path], check=True)
 
         print(f"\n{bcolors.WARNING}[!] Video created ლ(╹◡╹ლ) {bcolors.ENDC}\n")
-        
-        self.video_writer.close()
 
-        if not is_gif and add_original_audio:
-            self.add_original_audio(compression_speed=compression_speed)
+        if not keep_segments:
+            shutil.rmtree(segment_folder)
 
         return True
 
-    def append_frames_to_output(self, frame, write_as_temp=True):
+    def _segment_ranges(self, segments: int):
+        """
+        Splits the time range of the video into `segments` (start frame, end frame) ranges of about the same length,
+        shouldn't be called outside of class.
+        """
+        start_frame, end_frame = self._get_frame_range()
+        end_frame = self.total_frame_count if end_frame is None else end_frame
+        segments = max(1, min(segments, end_frame - start_frame))
+        edges = np.linspace(start_frame, end_frame, segments + 1).astype(int)
+        return [(int(start), int(end)) for start, end in zip(edges[:-1], edges[1:])]
+
+    def append_frames_to_output(self, frame, pipe_to_ffmpeg=True):
         """
         Append frames to video output, automatically create video writer if not instantiated yet.
 
-        @param `write_as_temp`: Whether to write frames to temporary output path or actual output path.
+        The frame is copied into the writer stage (see `set_writer_buffer`), so it can be reused right away.
+        Waits if the writer stage is full.
+
+        Raises whatever the video writer raised if writing an earlier frame failed, or ValueError if the frame
+        isn't the size of the earlier ones, so the conversion stops and the writer is aborted straight away.
+
+        @param `pipe_to_ffmpeg`: Whether to stream frames to ffmpeg (which also adds the audio, and writes GIFs), or write with imageio.
         """
-        if self.video_writer is None or self.video_writer.closed:
-            self._create_video_writer(write_as_temp=write_as_temp)
-        
-        try:
-            self.video_writer.append_data(frame)
-            return True
-        except:
-            print(f"{bcolors.WARNING}[-] Rewriting video due to some weird reason :< {bcolors.ENDC}\n")
-            return False
+        if self.frame_writer is None or self.frame_writer.closed:
+            self._create_video_writer(pipe_to_ffmpeg=pipe_to_ffmpeg)
 
-    def _create_video_writer(self, write_as_temp=True):
+        self.frame_writer.put(frame)
+        return True
+
+    def _create_video_writer(self, pipe_to_ffmpeg=True):
         """
-        Create video writer, shouldn't be called outside of class.
+        Create video writer and the writer stage in front of it, shouldn't be called outside of class.
         """
-        if write_as_temp:
-            self.video_writer = imageio.get_writer(self.temp_video_output_path, fps=self.fps)
+        colour = self.image_to_ascii_converter.colour
+        pixel_format = self.gif_palette if self._is_gif_output() else "gray"
+
+        if pipe_to_ffmpeg:
+            audio_source_path = self.video_path if self.video_writer_audio and not self._is_gif_output() else None
+            self.video_writer = FFmpegPipeWriter(self.video_output_path, self._get_output_fps(), preset=self.video_writer_preset,
+                                                 audio_source_path=audio_source_path, audio_start_time=self._get_audio_range()[0],
+                                                 audio_duration=self._get_audio_range()[1])
+            pixel_format = "bgr" if colour else pixel_format
         else:
-            self.video_writer = imageio.get_writer(self.video_output_path, fps=self.fps)
+            import imageio
+            self.video_writer = imageio.get_writer(self.video_output_path, fps=self._get_output_fps())
+            pixel_format = "rgb" if colour else pixel_format
+
+        self.frame_writer = FrameWriter(self.video_writer, pixel_format, self.writer_max_frames, self.writer_max_bytes, self.profiler)
 
-    def add_original_audio(self, del_temp:bool=True, compression_speed: str="slower"):
+    def _is_gif_output(self):
         """
-        Adds original audio to video.
+        Returns True if the output is a GIF, shouldn't be called outside of class.
         """
-        # Check if compression speed is actually correct, else default to veryslow,
-        # which I think is a good enough speed for a good enouh compression rate
-        if compression_speed.lower() not in ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow", "placebo"]:
-            compression_speed = "veryslow"
+        return os.path.splitext(self.video_output_path)[-1].lower() == ".gif"
 
-        print(f"{bcolors.WARNING}[!] Adding audio to video file of path {self.video_output_path} -.- {bcolors.ENDC}\n")
+    def _close_frame_writer(self):
+        """
+        Waits for the writer stage to write everything, then closes it and the video writer, shouldn't be called outside of class.
+        """
+        if self.frame_writer is not None:
+            self.frame_writer.close()
 
-        if compression_speed.lower() in ["veryslow", "placebo"]:
-            print(f"{bcolors.WARNING}[!] It will be damn slow for compression, if you don't feel like waiting try change the speed up a bit o((>w< ))o {bcolors.ENDC}\n")
+    def _abort_frame_writer(self):
+        """
+        Stops the writer stage and the video writer without finishing the video, shouldn't be called outside of class.
+        """
+        if self.frame_writer is not None:
+            self.frame_writer.abort()
+
+
+def _create_image_to_ascii_converter(settings: dict):
+    """
+    Creates an image to ASCII converter from the settings given by `VID2ASCIIConverter._image_to_ascii_converter_settings`.
+    """
+    converter = IMG2ASCIIConverter()
+    converter.set_ascii_chars_count(settings["horizontal_ascii_chars_count"], settings["vertical_ascii_chars_count"])
+    converter.set_render_backend(settings["render_backend"])
+    converter.set_incremental_render(settings["incremental_render"])
+    converter.set_shape_matching(settings["shape_matching"])
+    converter.set_colour(settings["colour"], settings["colour_palette"])
+    converter.set_render_size(settings["render_fontsize"], settings["resize_output"])
+    return converter
+
+
+def _create_profiler(settings: dict):
+    """
+    Creates the profiler of a worker from the settings given by `VID2ASCIIConverter._image_to_ascii_converter_settings`,
+    or returns None if the run isn't being profiled.
+    """
+    if settings["profile_allocations"] is None:
+        return None
+
+    return StageProfiler(trace_allocations=settings["profile_allocations"])
+
+
+def _create_frame_cache(max_frames: int, tolerance: int):
+    """
+    Creates a frame cache, or returns None if `max_frames` is 0.
+    """
+    return FrameCache(max_frames, tolerance) if max_frames > 0 else None
+
+
+def _convert_frames_worker(settings: dict, gscale_level: int, frame_cache_settings: tuple, input_name: str, input_shape: tuple,
+                           output_name: str, output_shape: tuple, ring_size: int, tasks, done):
+    """
+    Worker process for `VID2ASCIIConverter._convert_frames_in_processes`, with its own image to ASCII converter.
+
+    Takes (frame index, slot) from `tasks`, converts the frame in that slot of the input ring into the same slot
+    of the output ring, then puts (frame index, slot) to `done`. Stops when it gets None, after putting
+    ("frame cache", (lookups, hits)) to `done` if it has a frame cache, and ("profile", samples) if it is profiled.
+    """
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    input_ring = np.ndarray((ring_size, *input_shape), dtype=np.uint8, buffer=input_memory.buf)
+    output_ring = np.ndarray((ring_size, *output_shape), dtype=np.uint8, buffer=output_memory.buf)
+
+    converter = _create_image_to_ascii_converter(settings)
+    frame_cache = _create_frame_cache(*frame_cache_settings)
+    profiler = _create_profiler(settings)
+    converter.set_profiler(profiler)
+
+    try:
+        for task in iter(tasks.get, None):
+            i, slot = task
+            output_ring[slot] = VID2ASCIIConverter._convert_frame(converter, input_ring[slot], gscale_level, frame_cache)
+            done.put((i, slot))
+
+        if frame_cache is not None:
+            done.put(("frame cache", (frame_cache.lookups, frame_cache.hits)))
+
+        if profiler is not None:
+            done.put(("profile", profiler.samples))
+            profiler.close()
+    finally:
+        del input_ring, output_ring
+        input_memory.close()
+        output_memory.close()
+
+
+def _is_kept_frame(offset: int, frame_step: float):
+    """
+    Returns True if the frame `offset` frames after the first one is kept when keeping one frame every `frame_step` frames.
+    """
+    return offset == 0 or int(offset / frame_step) != int((offset - 1) / frame_step)
+
+
+def _select_frames(video_capture, start_frame: int, end_frame: int, first_frame: int, frame_step: float, profiler=None):
+    """
+    Goes through frames `start_frame` to `end_frame` (None for the end of the video) of a video capture, and yields the index of every
+    frame kept when keeping one frame every `frame_step` frames counting from `first_frame`, right before it is to be read, so that
+    reading it is timed as one "decode". The caller has to read (or grab) every yielded frame and stop once that fails.
+    The dropped frames are only grabbed, which skips turning them into images, and are timed as "seek".
+    """
+    if int(video_capture.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    frame_index = start_frame
+
+    while end_frame is None or frame_index < end_frame:
+        if _is_kept_frame(frame_index - first_frame, frame_step):
+            yield frame_index
+        else:
+            with profile_stage(profiler, "seek"):
+                ret = video_capture.grab()
+
+            if not ret:
+                return
+
+        frame_index += 1
+
+
+def _segment_done_marker_path(segment_path: str):
+    """
+    Path of the file that says a segment was written completely.
+    """
+    return os.path.splitext(segment_path)[0] + ".done"
+
+
+def _is_segment_done(segment_path: str, start_frame: int, end_frame: int, frame_selection: tuple=(0, 1.0)):
+    """
+    Returns True if the segment was already written completely for the same frame range,
+    keeping the same frames (first frame, frame step).
+    """
+    marker_path = _segment_done_marker_path(segment_path)
+
+    if not (os.path.exists(segment_path) and os.path.exists(marker_path)):
+        return False
+
+    with open(marker_path) as f:
+        return f.read().strip() == f"{start_frame} {end_frame} {frame_selection[0]} {frame_selection[1]}"
+
+
+def _convert_segment_worker(job: tuple):
+    """
+    Worker process for `VID2ASCIIConverter.create_video_segmented`, converts and encodes frames
+    `start_frame` to `end_frame` of the video into their own segment file, keeping the frames given by
+    `frame_selection` (first frame, frame step) like the rest of the video, and returns its path
+    with the (lookups, hits) of its frame cache and the samples of its profiler (None if not profiled).
+    """
+    video_path, settings, gscale_level, start_frame, end_frame, frame_selection, fps, segment_path, compression_speed, frame_cache_settings = job
+
+    converter = _create_image_to_ascii_converter(settings)
+    frame_cache = _create_frame_cache(*frame_cache_settings)
+    profiler = _create_profiler(settings)
+    converter.set_profiler(profiler)
+
+    video_capture = cv2.VideoCapture(video_path)
+
+    # The writer only puts the segment at its path once it is complete, so one that got cut off halfway is never mistaken for a finished one
+    video_writer = FrameWriter(FFmpegPipeWriter(segment_path, fps, preset=compression_speed), "bgr" if settings["colour"] else "gray", profiler=profiler)
+
+    try:
+        # Seeks to the start of the segment first
+        for _ in _select_frames(video_capture, start_frame, end_frame, *frame_selection, profiler):
+            with profile_stage(profiler, "decode"):
+                ret, frame = video_capture.read()
+
+            if not ret:
+                break
+
+            ascii_image_array = VID2ASCIIConverter._convert_frame(converter, frame, gscale_level, frame_cache)
+
+            video_writer.put(ascii_image_array)
+
+        video_writer.close()
+    finally:
+        # Only does anything if the segment failed, the writer is already closed otherwise
+        video_writer.abort()
+        video_capture.release()
+
+    with open(_segment_done_marker_path(segment_path), mode='w') as f:
+        f.write(f"{start_frame} {end_frame} {frame_selection[0]} {frame_selection[1]}")
+
+    profile_samples = None
+
+    if profiler is not None:
+        profile_samples = profiler.samples
+        profiler.close()
 
-        video_clip = VideoFileClip(self.temp_video_output_path)
-        audio_clip = AudioFileClip(self.video_path)
-        video_clip = video_clip.set_audio(audio_clip)
-        video_clip.write_videofile(self.video_output_path, preset=compression_speed.lower())
+    if frame_cache is None:
+        return segment_path, (0, 0), profile_samples
 
-        if del_temp:
-            os.remove(self.temp_video_output_path)
+    return segment_path, (frame_cache.lookups, frame_cache.hits), profile_samples
 
-        print(f"\n{bcolors.WARNING}[!] Finished adding audio to {self.video_output_path} · ᴗ · {bcolors.ENDC}\n")
 
 if __name__ == "__main__":
     t0 = time.time()